@@ -3,12 +3,13 @@ from django.http import JsonResponse
 import json
 import stripe
 from .models import Order, OrderItem
-from tackle.models import WebhookLog, Product
+from tackle.models import WebhookLog, Product, FinancialStatus
 from django.conf import settings
 from auth_app.models import CustomUser, Order, OrderItem, Address
-from tackle.views import Cart
+from tackle.cart import Cart
 from django.db import transaction
 from django.shortcuts import redirect
+from django.template.loader import render_to_string
 from django.urls import reverse
 
 
@@ -51,15 +52,19 @@ def stripe_webhook(request):
         payment_intent = event.data.object
         webhook_log.payment_intent_id = payment_intent.id
         try:
-            order = Order.objects.get(payment_intent_id=payment_intent.id)
-            order.payment_status = "completed"
-            order.status = "paid"
-            order.save()
+            with transaction.atomic():
+                order = Order.objects.get(
+                    payment_intent_id=payment_intent.id
+                )
+                order.payment_status = "completed"
+                order.status = "paid"
+                order.save()
 
-            for order_item in order.items.all():
-                product = order_item.product
-                product.financial_status = "sold"
-                product.save()
+                # Saved one by one so the facet count signals fire
+                for order_item in order.items.select_related("product"):
+                    product = order_item.product
+                    product.financial_status = FinancialStatus.SOLD
+                    product.save()
 
             webhook_log.order = order
             webhook_log.status = "success"
@@ -118,6 +123,18 @@ def handle_payment(request):
     payment_method_id = request.POST.get("payment_method")
 
     try:
+        cart = Cart(request)
+        cart_changes = cart.revalidate()
+        if cart_changes:
+            # Shown in the payment form, so the shopper sees what changed
+            return JsonResponse({
+                "error": "Your cart has changed since you started checkout. "
+                         "Please review it before paying.",
+                "error_html": render_to_string(
+                    "cart-changes.html", {"cart_changes": cart_changes}
+                ),
+            })
+
         if request.user.is_authenticated:
             user = request.user
         else:
@@ -134,15 +151,13 @@ def handle_payment(request):
                     is_staff=False,
                 )
 
-        cart = Cart(request)
-        total_amount = int(cart.get_total_price() + cart.get_shipping_total())
-        total_amount *= 100
+        total_amount = cart.get_combined_total_pence()
 
         order = Order(
             user=user,
             product_cost=cart.get_total_price(),
             shipping_cost=cart.get_shipping_total(),
-            total_amount=(cart.get_total_price() + cart.get_shipping_total()),
+            total_amount=cart.get_combined_total(),
             payment_status="pending",
         )
         order.save()
@@ -205,10 +220,10 @@ def handle_payment(request):
         for item in cart:
             order_item = OrderItem.objects.create(
                 order=order,
-                product_id=item["product_id"],
-                price=item["price"],
-                quantity=item["quantity"],
-                seller=item["product"].user,
+                product_id=item.product_id,
+                price=item.price,
+                quantity=item.quantity,
+                seller=item.product.user,
             )
 
             stripe.Transfer.create(
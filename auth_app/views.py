@@ -242,7 +242,7 @@ class Buying(View):
                 product = item.product
                 first_image = product.images.first()
                 if first_image:
-                    order_product_images[product.id] = first_image.image.url
+                    order_product_images[product.id] = first_image
         return order_product_images
 
 
@@ -265,7 +265,7 @@ class Selling(View):
         for product in products:
             first_image = ProductImage.objects.filter(product=product).first()
             if first_image:
-                product_images[product.id] = first_image.image.url
+                product_images[product.id] = first_image
         return product_images
 
 
@@ -38,6 +38,7 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     "admin_app",
     "auth_app",
     "tackle",
@@ -57,6 +58,7 @@ MIDDLEWARE = [
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
+    "tackle.middleware.CartCookieMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
     "allauth.account.middleware.AccountMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
@@ -185,9 +187,22 @@ AWS_DEFAULT_ACL = "public-read"
 
 # Media files
 MEDIA_URL = "https://%s/" % AWS_S3_CUSTOM_DOMAIN
-DEFAULT_FILE_STORAGE = "storages.backends.s3boto3.S3Boto3Storage"
+DEFAULT_FILE_STORAGE = "tackle.storage.MediaStorage"
+# Public media URLs each web process keeps built
+MEDIA_URL_CACHE_SIZE = 10000
 AWS_DEFAULT_ACL = None
 
+# Raw product photos wait for `manage.py process_images` in this directory
+# when it is set, or under pending/ in the media bucket otherwise. A local
+# directory only works when the worker shares the web process's filesystem.
+PENDING_IMAGE_ROOT = os.getenv("PENDING_IMAGE_ROOT")
+IMAGE_WORKERS = 2
+# Only turn async processing on with the Procfile's worker process scaled
+# up, or uploads wait forever. With it off, uploads are processed in the
+# request on a thread pool of this size.
+IMAGE_PROCESSING_ASYNC = os.getenv("IMAGE_PROCESSING_ASYNC") == "True"
+IMAGE_PROCESSING_THREADS = 4
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
@@ -207,12 +222,41 @@ EMAIL_USE_TLS = True
 
 # Cart Info
 CART_SESSION_ID = "cart"
+# Anonymous shoppers keep their cart in this signed cookie rather than the
+# session, so carting writes nothing to the database until they log in
+ANONYMOUS_CART_COOKIE = True
+CART_COOKIE_NAME = "cart"
 SESSION_COOKIE_AGE = 86400
 SESSION_EXPIRE_AT_BROWSER_CLOSE = True
 
+# With a shared Redis cache, sessions are served from it and written to
+# the database behind it, coalescing each session's saves into one write
+# per interval. Without one, sessions stay in the database.
+if os.getenv("REDIS_URL"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.getenv("REDIS_URL"),
+        }
+    }
+    SESSION_ENGINE = "tackle.sessions"
+SESSION_WRITE_BEHIND_INTERVAL = 1
+
 
 LOGIN_URL = "/auth/login/"
 
+# Maximum suggestions returned by the brand and category autocomplete
+AUTOCOMPLETE_LIMIT = 10
+# Seconds a worker keeps its in-memory autocomplete index. Saves bump a
+# version in the cache, but the default cache is per process, so this
+# bounds how stale other workers can get.
+AUTOCOMPLETE_INDEX_TTL = 300
+
+# Per-worker cache of header search results: entries kept and seconds each
+# one lives
+SEARCH_CACHE_SIZE = 1000
+SEARCH_CACHE_TTL = 60
+
 # Stripe Keys
 STRIPE_SECRET_KEY = os.getenv("STRIPE_SECRET_KEY")
 STRIPE_PUBLISHABLE_KEY = os.getenv("STRIPE_PUBLISHABLE_KEY")
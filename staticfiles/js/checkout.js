@@ -1,10 +1,13 @@
+// This JS file is for checkout fuctionality
+/*jshint esversion: 6 */
+
+var stripe = Stripe('pk_test_wuEF85zmTLhJHgtL1wZUVWku003bmEKJ3y');
+var clientSecret = document.getElementById('stripe-data').getAttribute('data-client-secret');
 
-// Step 2: Create an instance of Elements with the clientSecret
 var elements = stripe.elements({
     clientSecret: clientSecret
 });
 
-// Step 3: Create the card element
 var cardElement = elements.create('payment');
 
 // Step 4: Mount the element to the div
@@ -21,10 +24,12 @@ form.addEventListener('submit', function (event) {
     btn.querySelector('.spinner-border').style.display = 'inline-block';
     btn.querySelector('.btn-text').textContent = 'Processing Order...';
     btn.disabled = true;  // Disable the button to prevent double-clicks
+    document.getElementById('payment-errors').innerHTML = '';
 
     stripe.createPaymentMethod('card', cardElement).then(function (result) {
         if (result.error) {
             console.error(result.error.message);
+            showPaymentError(result.error.message);
 
             // Revert the button to its original state
             revertButtonState(btn);
@@ -50,17 +55,34 @@ form.addEventListener('submit', function (event) {
                         window.location.href = data.redirect_url;
                     } else {
                         console.error('Order placement failed:', data.error);
+                        showPaymentError(data.error, data.error_html);
                         revertButtonState(btn);
                     }
                 })
                 .catch(error => {
                     console.error('Error submitting the form:', error);
+                    showPaymentError('Your order could not be placed. Please try again.');
                     revertButtonState(btn);
                 });
         }
     });
 });
 
+// Show why the order was not placed above the Place Order button. The
+// server sends error_html, the list of cart changes, when the cart has
+// changed since checkout started.
+function showPaymentError(message, html) {
+    var errors = document.getElementById('payment-errors');
+    errors.innerHTML = '';
+    var text = document.createElement('div');
+    text.className = 'alert alert-danger';
+    text.textContent = message;
+    errors.appendChild(text);
+    if (html) {
+        errors.insertAdjacentHTML('beforeend', html);
+    }
+}
+
 function revertButtonState(btn) {
     btn.querySelector('.spinner-border').style.display = 'none';
     btn.querySelector('.btn-text').textContent = 'Place Order';
@@ -112,7 +134,6 @@ function moveToPaymentStep() {
     var paymentDetails = document.getElementById('paymentDetails');
 
     if (addressDetails) {
-        console.log('addressDetails');
         addressDetails.style.display = 'none';
     }
     if (paymentDetails) {
@@ -0,0 +1,90 @@
+# Python standard library imports
+import re
+import time
+from bisect import bisect_left
+from itertools import islice
+
+# Django core imports
+from django.conf import settings
+
+# App-specific imports
+from .cache import bump_version, current_version
+from .search import suggest_names
+
+
+VERSION_KEY = 'autocomplete:version'
+
+# Per-worker indexes, keyed by model: (version, built_at, PrefixIndex)
+_indexes = {}
+
+
+class PrefixIndex:
+    """
+    Sorted in-memory index over a list of names for prefix lookups.
+
+    Every word of a name is a starting point, so "inter" finds
+    "Fox International" as well as names that start with it.
+    """
+    def __init__(self, names):
+        entries = set()
+        for name in names:
+            key = name.casefold()
+            for word in re.finditer(r'\w+', key):
+                entries.add((key[word.start():], name))
+        self.entries = sorted(entries)
+        self.keys = [key for key, name in self.entries]
+
+    def search(self, prefix, limit):
+        """
+        Up to `limit` distinct names with a word starting with `prefix`.
+        """
+        prefix = prefix.strip().casefold()
+        if not prefix:
+            return []
+        names = []
+        start = bisect_left(self.keys, prefix)
+        # Walk on from the bisect without copying the rest of the index
+        for key, name in islice(self.entries, start, None):
+            if not key.startswith(prefix) or len(names) == limit:
+                break
+            if name not in names:
+                names.append(name)
+        return names
+
+
+def bump_autocomplete_version():
+    """
+    Invalidate the prefix indexes in every worker.
+    """
+    bump_version(VERSION_KEY)
+
+
+def get_prefix_index(model):
+    """
+    This worker's index over `model` names, rebuilt when the shared version
+    moves on or it is older than AUTOCOMPLETE_INDEX_TTL seconds.
+    """
+    version = current_version(VERSION_KEY)
+    cached = _indexes.get(model)
+    if cached is not None:
+        cached_version, built_at, index = cached
+        age = time.monotonic() - built_at
+        if (cached_version == version and
+                age < settings.AUTOCOMPLETE_INDEX_TTL):
+            return index
+    index = PrefixIndex(model.objects.values_list('name', flat=True))
+    _indexes[model] = (version, time.monotonic(), index)
+    return index
+
+
+def autocomplete(model, term):
+    """
+    Names for the brand and category autocomplete. Prefix matches come
+    from memory; the trigram query only runs when nothing matches, which
+    is how typos still find a suggestion.
+    """
+    limit = settings.AUTOCOMPLETE_LIMIT
+    names = get_prefix_index(model).search(term, limit)
+    if names:
+        return names
+    return suggest_names(model, term, limit)
@@ -0,0 +1,141 @@
+# Python standard library imports
+import threading
+import time
+from collections import OrderedDict
+
+# Django core imports
+from django.core.cache import cache
+
+
+def current_version(key):
+    """
+    A shared version number kept in the Django cache, seeded with the
+    clock when missing so a restarted cache never repeats an old value.
+    """
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, time.time_ns())
+        version = cache.get(key)
+    return version
+
+
+def bump_version(key):
+    """
+    Move a shared version on, invalidating whatever was built against it.
+    """
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.add(key, time.time_ns())
+
+
+class _Flight:
+    """
+    A computation in progress that other callers for the same key wait on.
+    """
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class ResultCache:
+    """
+    Per-process LRU cache with a TTL and single-flight misses.
+
+    Concurrent misses for one key run `compute` once; the other callers
+    wait for its result. `clear()` also drops results still being
+    computed, so nothing fetched before an invalidation is stored after it.
+    When `version_key` is given the cache clears itself whenever that
+    shared version moves on, which is how other workers are invalidated.
+    """
+    def __init__(self, maxsize, ttl, version_key=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.version_key = version_key
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self._entries = OrderedDict()
+        self._flights = {}
+        self._generation = 0
+        self._version = None
+        self._lock = threading.Lock()
+
+    def get_or_compute(self, key, compute):
+        """
+        Return the cached value for `key`, calling `compute()` on a miss.
+        """
+        version = None
+        if self.version_key:
+            version = current_version(self.version_key)
+
+        with self._lock:
+            if version != self._version:
+                self._clear()
+                self._version = version
+
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                self.misses += 1
+                flight = self._flights[key] = _Flight()
+                generation = self._generation
+            else:
+                self.coalesced += 1
+
+        if not leader:
+            flight.done.wait()
+            if flight.error is not None:
+                raise flight.error
+            return flight.value
+
+        try:
+            flight.value = compute()
+        except Exception as error:
+            flight.error = error
+            raise
+        finally:
+            with self._lock:
+                if self._flights.get(key) is flight:
+                    del self._flights[key]
+                if flight.error is None and generation == self._generation:
+                    self._store(key, flight.value)
+            flight.done.set()
+        return flight.value
+
+    def clear(self):
+        """
+        Drop every entry and any result still being computed.
+        """
+        with self._lock:
+            self._clear()
+
+    def stats(self):
+        """
+        Hit, miss and coalesced counters with the current size.
+        """
+        with self._lock:
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced,
+                'size': len(self._entries),
+            }
+
+    def _clear(self):
+        self._entries.clear()
+        self._flights.clear()
+        self._generation += 1
+
+    def _store(self, key, value):
+        self._entries[key] = (value, time.monotonic() + self.ttl)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
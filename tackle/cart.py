@@ -0,0 +1,353 @@
+# Python standard library imports
+from collections import namedtuple
+from decimal import Decimal
+
+# Django core imports
+from django.conf import settings
+from django.core import signing
+
+# App-specific imports
+from .models import FinancialStatus, Product, ProductVisibility
+
+# Positions in a stored cart line: [quantity, price, shipping], in pence
+QUANTITY, PRICE, SHIPPING = range(3)
+
+
+def to_pence(amount):
+    """
+    Convert an amount in pounds, as a Decimal or string, to integer pence.
+    """
+    return int((Decimal(str(amount)) * 100).to_integral_value())
+
+
+def to_pounds(pence):
+    """
+    Convert integer pence back to pounds, always to two places.
+    """
+    return Decimal(pence).scaleb(-2)
+
+
+class SessionCartStorage:
+    """
+    Keeps the stored cart in the session.
+    """
+    def __init__(self, request):
+        self.session = request.session
+
+    def load(self):
+        return self.session.get(settings.CART_SESSION_ID) or {}
+
+    def save(self, cart):
+        """
+        Store the cart and mark the session as "modified" to ensure it's
+        saved.
+        """
+        self.session[settings.CART_SESSION_ID] = cart
+        self.session.modified = True
+
+    def clear(self):
+        self.session.pop(settings.CART_SESSION_ID, None)
+        self.session.modified = True
+
+
+class CookieCartStorage:
+    """
+    Keeps the stored cart in a signed, compressed cookie, so anonymous
+    shoppers cost no session writes. Changes are put on the request and
+    written to the response by CartCookieMiddleware.
+    """
+    salt = 'tackle.cart'
+
+    def __init__(self, request):
+        self.request = request
+
+    def load(self):
+        """
+        The cart in the cookie, or an empty one if it is missing, has been
+        tampered with or has expired.
+        """
+        value = self.request.COOKIES.get(settings.CART_COOKIE_NAME)
+        if not value:
+            return {}
+        try:
+            return signing.loads(
+                value, salt=self.salt, max_age=settings.SESSION_COOKIE_AGE
+            )
+        except signing.BadSignature:
+            return {}
+
+    def save(self, cart):
+        if not cart:
+            return self.clear()
+        self.request.cart_cookie = signing.dumps(
+            cart, salt=self.salt, compress=True
+        )
+
+    def clear(self):
+        self.request.cart_cookie = ''
+
+
+def cart_storage(request):
+    """
+    Where the request's cart is kept: a cookie for anonymous shoppers when
+    ANONYMOUS_CART_COOKIE is on, otherwise the session.
+    """
+    if settings.ANONYMOUS_CART_COOKIE and not request.user.is_authenticated:
+        return CookieCartStorage(request)
+    return SessionCartStorage(request)
+
+
+class CartItem(namedtuple(
+    'CartItem',
+    ['product', 'quantity', 'price', 'shipping_cost', 'total_price']
+)):
+    """
+    A cart line joined to its product, for templates and checkout. Amounts
+    are in pounds, as added to the cart.
+    """
+    @property
+    def product_id(self):
+        return self.product.id
+
+    @property
+    def thumbnail(self):
+        return self.product.primary_image
+
+
+class CartChange(namedtuple(
+    'CartChange',
+    ['product_id', 'name', 'reason', 'old_amount', 'new_amount'],
+    defaults=[None, None]
+)):
+    """
+    One difference revalidation found between a cart line and its product.
+    Price and shipping changes carry the old and new amounts in pounds;
+    sold and unavailable lines have been removed from the cart. `name` is
+    None for products that no longer exist.
+    """
+    PRICE_CHANGED = 'price_changed'
+    SHIPPING_CHANGED = 'shipping_changed'
+    SOLD = 'sold'
+    UNAVAILABLE = 'unavailable'
+
+    @property
+    def removed(self):
+        return self.reason in (self.SOLD, self.UNAVAILABLE)
+
+
+class Cart:
+    """
+    Class representing the shopping cart. Manages operations like adding,
+    removing, and iterating over cart items.
+
+    Only {product id: [quantity, price, shipping]} in integer pence is
+    stored, in the session or a cookie. Products are loaded once, on first
+    iteration, with a single query, and totals are worked out once from
+    the stored pence.
+    """
+    def __init__(self, request):
+        """
+        Initialize the cart. An empty cart is not stored until something
+        is added.
+        """
+        self.storage = cart_storage(request)
+        cart = self.storage.load()
+        for product_id, line in cart.items():
+            if isinstance(line, dict):
+                cart[product_id] = self.compact(line)
+        self.cart = cart
+        self._products = None
+        self._items = None
+        self._totals = None
+
+    @staticmethod
+    def compact(item):
+        """
+        A stored line from the dicts carts used to keep in the session.
+        """
+        return [
+            item['quantity'],
+            to_pence(item['price']),
+            to_pence(item.get('shipping_cost', 0)),
+        ]
+
+    def add(self, product, price):
+        """
+        Add a product to the cart or update its quantity.
+        """
+        product_id = str(product.id)
+        if product_id not in self.cart:
+            self.cart[product_id] = [
+                1, to_pence(price), to_pence(product.shipping)
+            ]
+        else:
+            self.cart[product_id][QUANTITY] += 1
+        self.save()
+
+    def save(self):
+        """
+        Store the cart. Loaded products and totals are worked out again.
+        """
+        self.storage.save(self.cart)
+        self._products = None
+        self._items = None
+        self._totals = None
+
+    def remove(self, product):
+        """
+        Remove a product from the cart.
+        """
+        product_id = str(product.id)
+        if product_id in self.cart:
+            del self.cart[product_id]
+            self.save()
+
+    def products(self):
+        """
+        The cart's products by id, loaded with one query the first time
+        they are needed.
+        """
+        if self._products is None:
+            self._products = Product.objects.filter(
+                id__in=self.cart.keys()
+            ).select_related('user', 'primary_image').in_bulk()
+        return self._products
+
+    def items(self):
+        """
+        The cart lines joined to their products. Products that no longer
+        exist are left out.
+        """
+        if self._items is None:
+            products = self.products()
+            self._items = []
+            for product_id, line in self.cart.items():
+                product = products.get(int(product_id))
+                if product is None:
+                    continue
+                quantity, price, shipping = line
+                self._items.append(CartItem(
+                    product,
+                    quantity,
+                    to_pounds(price),
+                    to_pounds(shipping),
+                    to_pounds((price + shipping) * quantity),
+                ))
+        return self._items
+
+    def revalidate(self):
+        """
+        Check every line against its product, from the same single query
+        as items(). Lines whose product has sold, is no longer live or has
+        been deleted are removed, and changed prices and shipping are
+        updated. Returns the changes as CartChange tuples, empty if the
+        cart was still valid.
+        """
+        products = self.products()
+        changes = []
+        for product_id, line in list(self.cart.items()):
+            product = products.get(int(product_id))
+            if product is None:
+                reason = CartChange.UNAVAILABLE
+            elif product.financial_status == FinancialStatus.SOLD:
+                reason = CartChange.SOLD
+            elif product.visibility != ProductVisibility.LIVE:
+                reason = CartChange.UNAVAILABLE
+            else:
+                for reason, position, amount in (
+                    (CartChange.PRICE_CHANGED, PRICE, product.price),
+                    (CartChange.SHIPPING_CHANGED, SHIPPING, product.shipping),
+                ):
+                    pence = to_pence(amount)
+                    if line[position] != pence:
+                        changes.append(CartChange(
+                            product.id, product.name, reason,
+                            to_pounds(line[position]), to_pounds(pence)
+                        ))
+                        line[position] = pence
+                continue
+            del self.cart[product_id]
+            changes.append(CartChange(
+                int(product_id), product.name if product else None, reason
+            ))
+
+        if changes:
+            # The loaded products are still current, so keep them
+            self.storage.save(self.cart)
+            self._items = None
+            self._totals = None
+        return changes
+
+    def __iter__(self):
+        """
+        Iterate over the items in the cart.
+        """
+        return iter(self.items())
+
+    def __len__(self):
+        """
+        Count all items in the cart.
+        """
+        return sum(line[QUANTITY] for line in self.cart.values())
+
+    def totals(self):
+        """
+        (product total, shipping total) in pence, worked out once.
+        """
+        if self._totals is None:
+            price = shipping = 0
+            for quantity, line_price, line_shipping in self.cart.values():
+                price += line_price * quantity
+                shipping += line_shipping * quantity
+            self._totals = price, shipping
+        return self._totals
+
+    def get_total_price(self):
+        return to_pounds(self.totals()[0])
+
+    def get_shipping_total(self):
+        return to_pounds(self.totals()[1])
+
+    def get_combined_total(self):
+        """
+        Get the combined total of product prices and shipping costs.
+        """
+        return to_pounds(self.get_combined_total_pence())
+
+    def get_combined_total_pence(self):
+        """
+        The combined total in pence, as Stripe charges it.
+        """
+        return sum(self.totals())
+
+    def clear(self):
+        """
+        Remove the cart from storage.
+        """
+        self.storage.clear()
+        self.cart = {}
+        self._products = None
+        self._items = None
+        self._totals = None
+
+    def contains(self, product):
+        """Check if the cart contains a particular product."""
+        product_id = str(product.id)
+        return product_id in self.cart
+
+
+def merge_cookie_cart(request):
+    """
+    Move a cart kept in the cookie into the session, adding its lines to
+    any cart the session already has, and remove the cookie.
+    """
+    cookie_storage = CookieCartStorage(request)
+    lines = cookie_storage.load()
+    if not lines:
+        return
+    session_storage = SessionCartStorage(request)
+    cart = session_storage.load()
+    for product_id, line in lines.items():
+        cart.setdefault(product_id, line)
+    session_storage.save(cart)
+    cookie_storage.clear()
@@ -1,9 +1,26 @@
-from .views import Cart
+from functools import lru_cache
+
+from django.conf import settings
+
+from .cart import Cart
 
 
 def cart_processor(request):
     """
-    Compile the total number of items in the cart
+    Compile the total number of items in the cart. It is passed as a
+    callable, so the cart is only read by templates that show it, and
+    visitors without a session or cart cookie have no cart to read at all.
     """
-    cart = Cart(request)
-    return {'total_items_in_cart': len(cart)}
+    session = getattr(request, 'session', None)
+    if session is None or (
+        settings.SESSION_COOKIE_NAME not in request.COOKIES
+        and settings.CART_COOKIE_NAME not in request.COOKIES
+        and not session.accessed
+    ):
+        return {'total_items_in_cart': 0}
+
+    @lru_cache(maxsize=None)
+    def total_items_in_cart():
+        return len(Cart(request))
+
+    return {'total_items_in_cart': total_items_in_cart}
@@ -0,0 +1,177 @@
+# Python standard library imports
+from collections import namedtuple
+from decimal import Decimal
+
+# Django core imports
+from django.db import transaction
+from django.db.models import Case, CharField, Count, F, Value, When
+
+# App-specific imports
+from .models import (
+    Condition, FacetCount, FinancialStatus, Product, ProductVisibility
+)
+
+
+FacetBucket = namedtuple('FacetBucket', ['value', 'label', 'count'])
+
+# (key, label, lower bound inclusive, upper bound exclusive)
+PRICE_BANDS = (
+    ('under-25', 'Under £25', None, Decimal('25')),
+    ('25-50', '£25 to £50', Decimal('25'), Decimal('50')),
+    ('50-100', '£50 to £100', Decimal('50'), Decimal('100')),
+    ('100-250', '£100 to £250', Decimal('100'), Decimal('250')),
+    ('250-plus', '£250 and over', Decimal('250'), None),
+)
+
+FACET_FIELDS = (
+    'brand_id', 'brand_name', 'category_id', 'category_name',
+    'condition', 'price_band',
+)
+
+
+def get_price_band(key):
+    """
+    Return the (lower, upper) bounds for a price band key, or None if the
+    key is unknown.
+    """
+    for band_key, _, lower, upper in PRICE_BANDS:
+        if band_key == key:
+            return lower, upper
+    return None
+
+
+def price_band_for(price):
+    """
+    Return the price band key for a single price.
+    """
+    price = Decimal(str(price))
+    for key, _, _, upper in PRICE_BANDS:
+        if upper is None or price < upper:
+            return key
+
+
+def facet_key(state):
+    """
+    Turn a Product.facet_state() tuple into the FacetCount key it is
+    counted under, or None if the product is not live and unsold.
+    """
+    if state is None:
+        return None
+    brand_id, category_id, condition, price, visibility, status = state
+    if visibility != ProductVisibility.LIVE or status == FinancialStatus.SOLD:
+        return None
+    return brand_id, category_id, condition, price_band_for(price)
+
+
+def price_band_expression():
+    """
+    SQL expression that maps a product's price to its price band key.
+    """
+    whens = [
+        When(price__lt=upper, then=Value(key))
+        for key, _, _, upper in PRICE_BANDS if upper is not None
+    ]
+    return Case(
+        *whens, default=Value(PRICE_BANDS[-1][0]), output_field=CharField()
+    )
+
+
+def facet_rows(products):
+    """
+    Count the products in a queryset grouped by every facet at once.
+    This is the single GROUP BY query the facet buckets are built from.
+    """
+    return products.order_by().annotate(
+        brand_name=F('brand__name'),
+        category_name=F('category__name'),
+        price_band=price_band_expression(),
+    ).values(*FACET_FIELDS).annotate(count=Count('id'))
+
+
+def rollup_rows(**filters):
+    """
+    Facet rows read from the FacetCount rollup instead of the products
+    table. Filters are applied to the rollup's own columns.
+    """
+    return FacetCount.objects.filter(count__gt=0, **filters).annotate(
+        brand_name=F('brand__name'),
+        category_name=F('category__name'),
+    ).values(*FACET_FIELDS, 'count')
+
+
+def rebuild_facet_counts():
+    """
+    Recount every live, unsold product into a fresh FacetCount table.
+    Returns the number of rollup rows written.
+    """
+    rows = facet_rows(Product.objects.live())
+    with transaction.atomic():
+        FacetCount.objects.all().delete()
+        counts = FacetCount.objects.bulk_create([
+            FacetCount(
+                brand_id=row['brand_id'],
+                category_id=row['category_id'],
+                condition=row['condition'],
+                price_band=row['price_band'],
+                count=row['count'],
+            )
+            for row in rows
+        ])
+    return len(counts)
+
+
+def build_facets(rows):
+    """
+    Roll grouped rows up into brand, category, condition and price band
+    buckets. Each row needs the FACET_FIELDS keys plus a count.
+    """
+    brands = {}
+    categories = {}
+    conditions = {}
+    price_bands = {}
+
+    for row in rows:
+        count = row['count']
+        if not count:
+            continue
+        _add(brands, row['brand_id'], row['brand_name'], count)
+        _add(categories, row['category_id'], row['category_name'], count)
+        _add(conditions, row['condition'], row['condition'], count)
+        _add(price_bands, row['price_band'], row['price_band'], count)
+
+    condition_order = [condition.value for condition in Condition]
+    band_labels = {key: label for key, label, _, _ in PRICE_BANDS}
+
+    return {
+        'brand': sorted(brands.values(), key=lambda b: b.label.lower()),
+        'category': sorted(
+            categories.values(), key=lambda b: b.label.lower()
+        ),
+        'condition': sorted(
+            conditions.values(),
+            key=lambda b: (
+                condition_order.index(b.value)
+                if b.value in condition_order else len(condition_order)
+            )
+        ),
+        'price_band': [
+            price_bands[key]._replace(label=band_labels[key])
+            for key, _, _, _ in PRICE_BANDS if key in price_bands
+        ],
+    }
+
+
+def compute_facets(products):
+    """
+    Brand, category, condition and price band buckets with per-bucket
+    counts for a filtered product queryset, from one aggregate query.
+    """
+    return build_facets(facet_rows(products))
+
+
+def _add(buckets, value, label, count):
+    bucket = buckets.get(value)
+    if bucket is None:
+        buckets[value] = FacetBucket(value, label, count)
+    else:
+        buckets[value] = bucket._replace(count=bucket.count + count)
@@ -0,0 +1,230 @@
+# Python standard library imports
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# Django core imports
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.db import transaction
+
+# App-specific imports
+from .images import process_image
+from .models import ImageBlob, ImageStatus, ProductImage
+from .storage import PendingImageStorage
+
+logger = logging.getLogger(__name__)
+
+# ProductImage fields store_processed fills in from the processed image
+METADATA_FIELDS = ['width', 'height', 'size', 'dominant_colour']
+
+
+def pending_storage():
+    """
+    Where raw uploads wait for the image worker: PENDING_IMAGE_ROOT if it
+    is set, otherwise the private pending/ prefix of the media bucket.
+    """
+    if settings.PENDING_IMAGE_ROOT:
+        return FileSystemStorage(location=settings.PENDING_IMAGE_ROOT)
+    return PendingImageStorage()
+
+
+def queue_image(product, uploaded_file):
+    """
+    Keep the raw upload in pending storage and add a pending image for the
+    worker to process, so the request does no image work itself.
+    """
+    name = pending_storage().save(
+        f"{product.pk}/{uploaded_file.name}", uploaded_file
+    )
+    return ProductImage.objects.create(
+        product=product, status=ImageStatus.PENDING, pending_file=name
+    )
+
+
+def discard_pending_file(name):
+    """
+    Remove a raw upload from pending storage.
+    """
+    pending_storage().delete(name)
+
+
+def store_processed(image, processed):
+    """
+    Point an image and its responsive variants at image blobs and record
+    its dimensions, byte size and dominant colour, without saving the row.
+    Bytes another image already uses are shared. Returns the (name,
+    buffer) of new blobs, which still need uploading with upload_blobs().
+    """
+    new_blobs = []
+
+    def acquire(buffer, extension):
+        name, created = ImageBlob.objects.acquire(buffer, extension)
+        if created:
+            new_blobs.append((name, buffer))
+        return name
+
+    image.image.name = acquire(processed.buffer, 'jpg')
+    variants = {'jpeg': {str(processed.width): image.image.name}}
+    for extension, width, buffer in processed.variants:
+        variants.setdefault(extension, {})[str(width)] = acquire(
+            buffer, extension
+        )
+    image.variants = variants
+    image.width, image.height = processed.width, processed.height
+    image.size = processed.size
+    image.dominant_colour = processed.colour
+    return new_blobs
+
+
+def upload_blobs(images, new_blobs, map_tasks=map):
+    """
+    Upload new blobs from store_processed(), through `map_tasks` so they
+    can go up on a thread pool. If storage saved any under another name,
+    the blob rows and `images` are pointed at it.
+    """
+    stored_names = map_tasks(
+        lambda blob: ImageBlob.objects.store(*blob), new_blobs
+    )
+    renamed = {
+        name: stored_name
+        for (name, _), stored_name in zip(new_blobs, stored_names)
+        if stored_name != name
+    }
+    if renamed:
+        ImageBlob.objects.rename(renamed)
+        for image in images:
+            image.rename_blobs(renamed)
+
+
+def process_pending_image(image):
+    """
+    Process a pending image into the default storage and mark it ready,
+    or failed if it cannot be read. The raw upload is removed once stored
+    and kept on failure so it can be retried.
+    """
+    try:
+        with pending_storage().open(image.pending_file) as raw:
+            processed = process_image(raw)
+        with transaction.atomic():
+            upload_blobs([image], store_processed(image, processed))
+    except Exception:
+        logger.exception("Could not process product image %s", image.pk)
+        image.status = ImageStatus.FAILED
+        image.save(update_fields=['status'])
+        return image
+
+    pending_file = image.pending_file
+    image.status = ImageStatus.READY
+    image.pending_file = ''
+    image.save(update_fields=[
+        'image', 'variants', 'status', 'pending_file', *METADATA_FIELDS
+    ])
+    transaction.on_commit(lambda: discard_pending_file(pending_file))
+    return image
+
+
+def delete_legacy_files(names):
+    """
+    Remove files stored before image blobs existed, which no blob row
+    counts references to, unless another image still uses them.
+    """
+    for name in names:
+        if not ProductImage.objects.filter(image=name).exists():
+            default_storage.delete(name)
+
+
+def reprocess_image(image_id, source_name, processed):
+    """
+    Replace a ready image's files with `processed`, a fresh run of the
+    pipeline over them, and release the blobs it used before. Files from
+    before blobs existed are deleted once the change commits. Returns
+    None without changing anything if the image was deleted or its file
+    replaced since `source_name` was read.
+    """
+    with transaction.atomic():
+        image = ProductImage.objects.select_for_update().filter(
+            pk=image_id, status=ImageStatus.READY, image=source_name
+        ).first()
+        if image is None:
+            return None
+        old_names = image.blob_names()
+        upload_blobs([image], store_processed(image, processed))
+        image.save(update_fields=['image', 'variants', *METADATA_FIELDS])
+        ImageBlob.objects.release(old_names)
+        legacy_names = {
+            name for name in old_names
+            if not name.startswith(ImageBlob.PREFIX)
+        }
+        if legacy_names:
+            transaction.on_commit(
+                lambda: delete_legacy_files(legacy_names)
+            )
+    return image
+
+
+def process_images_now(product, uploaded_files, threads=None):
+    """
+    Process and store uploads during the request. Pillow releases the GIL
+    while it decodes, resizes and encodes, and storage uploads wait on the
+    network, so both run on a thread pool of IMAGE_PROCESSING_THREADS.
+    Blob references are taken on this thread, which owns the database
+    connection, in one transaction with the uploads and the insert, so a
+    failure leaves no references behind.
+    """
+    if threads is None:
+        threads = settings.IMAGE_PROCESSING_THREADS
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        processed_images = list(pool.map(process_image, uploaded_files))
+        with transaction.atomic():
+            images, new_blobs = [], []
+            for processed in processed_images:
+                image = ProductImage(product=product)
+                new_blobs += store_processed(image, processed)
+                images.append(image)
+            upload_blobs(images, new_blobs, pool.map)
+            return ProductImage.objects.bulk_create(images)
+
+
+def add_product_images(product, uploaded_files):
+    """
+    Attach uploads to a product: queued for the image worker, or processed
+    straight away when IMAGE_PROCESSING_ASYNC is off.
+    """
+    if settings.IMAGE_PROCESSING_ASYNC:
+        return [
+            queue_image(product, uploaded_file)
+            for uploaded_file in uploaded_files
+        ]
+    return process_images_now(product, uploaded_files)
+
+
+def process_next_image():
+    """
+    Claim the oldest pending image and process it. The row stays locked
+    until it is done and other workers skip it, so several workers can
+    drain the queue together. Returns the image, or None when the queue
+    is empty.
+    """
+    with transaction.atomic():
+        image = ProductImage.objects.select_for_update(
+            skip_locked=True
+        ).filter(status=ImageStatus.PENDING).order_by('id').first()
+        if image is None:
+            return None
+        return process_pending_image(image)
+
+
+def run_worker(once=False, interval=2):
+    """
+    Process images until the queue is empty if `once`, otherwise forever,
+    polling every `interval` seconds while idle.
+    """
+    processed = 0
+    while True:
+        if process_next_image() is not None:
+            processed += 1
+        elif once:
+            return processed
+        else:
+            time.sleep(interval)
@@ -0,0 +1,246 @@
+# Python standard library imports
+import os
+from collections import namedtuple
+from io import BytesIO
+
+# Django core imports
+from django.core.files.uploadedfile import InMemoryUploadedFile
+
+# Third-party imports
+from PIL import Image
+
+
+MIN_JPEG_QUALITY = 30
+MAX_JPEG_QUALITY = 100
+QUALITY_STEP = 2
+
+# Responsive widths served through srcset, and the (file extension, Pillow
+# format, quality) each one is encoded in
+VARIANT_WIDTHS = (160, 320, 640, 894)
+VARIANT_FORMATS = (('webp', 'WEBP', 80), ('jpeg', 'JPEG', 82))
+
+
+def encode_jpeg(img, quality):
+    """
+    Encode `img` as a JPEG at `quality` into a new buffer.
+    """
+    buffer = BytesIO()
+    img.save(buffer, format="JPEG", quality=quality)
+    return buffer
+
+
+def compress_jpeg(img, target_filesize):
+    """
+    Find the highest quality on the old loop's grid (100, 98, ... 30) whose
+    encoding fits in `target_filesize` bytes, or the minimum if none does.
+
+    Most photos fit at 100 and cost a single encode. Otherwise the search
+    gallops down the grid in doubling steps until something fits, then
+    bisects the gap, so no photo needs more than ten encodes rather
+    than 36. Returns (buffer, quality, encodes).
+    """
+    qualities = range(MAX_JPEG_QUALITY, MIN_JPEG_QUALITY - 1, -QUALITY_STEP)
+    attempts = {}
+
+    def fits(index):
+        attempts[index] = encode_jpeg(img, qualities[index])
+        return attempts[index].tell() <= target_filesize
+
+    # Invariant: qualities[failed] is too big, qualities[found] fits or is
+    # the minimum
+    if fits(0):
+        return attempts[0], qualities[0], 1
+    failed, step = 0, 1
+    while True:
+        found = min(failed + step, len(qualities) - 1)
+        if fits(found) or found == len(qualities) - 1:
+            break
+        failed, step = found, step * 2
+
+    while found - failed > 1:
+        middle = (failed + found) // 2
+        if fits(middle):
+            found = middle
+        else:
+            failed = middle
+
+    return attempts[found], qualities[found], len(attempts)
+
+
+class ProcessedImage(namedtuple(
+    'ProcessedImage',
+    ['buffer', 'width', 'height', 'size', 'format', 'variants', 'colour'],
+    defaults=[(), '']
+)):
+    """
+    The encoded bytes of a processed upload, rewound and ready to store,
+    with what is known about them. `variants` holds the smaller responsive
+    copies as (extension, width, buffer) and `colour` is the dominant
+    colour as a CSS hex string.
+    """
+    content_type = 'image/jpeg'
+
+    def as_file(self, name):
+        """
+        Wrap the buffer as an uploaded file named after the original
+        upload, with the extension changed to match the JPEG inside.
+        """
+        filename = f"{os.path.splitext(name)[0]}.jpg"
+        return InMemoryUploadedFile(
+            self.buffer, None, filename, self.content_type, self.size, None
+        )
+
+
+# What Pillow raises for uploads whose header reads fine but whose pixels
+# cannot be processed: truncated or corrupt data, or a decompression bomb
+IMAGE_ERRORS = (OSError, ValueError, TypeError, Image.DecompressionBombError)
+
+
+def is_supported_image(upload):
+    """
+    Whether an upload is a JPEG or PNG that Pillow can read, judged from
+    its header without decoding the pixels.
+    """
+    try:
+        image_format = Image.open(upload).format
+    except (OSError, ValueError):
+        return False
+    finally:
+        upload.seek(0)
+    return image_format in ('JPEG', 'PNG')
+
+
+def encode_variants(img, widths=VARIANT_WIDTHS):
+    """
+    Encode `img` at each responsive width narrower than itself, and at its
+    own width, in every variant format. The full width JPEG is left out
+    as it is the main image. Returns a list of (extension, width, buffer),
+    empty when no widths are asked for.
+    """
+    if not widths:
+        return []
+    variants = []
+    sizes = [width for width in widths if width < img.width]
+    for width in sizes + [img.width]:
+        if width == img.width:
+            resized = img
+        else:
+            resized = img.resize(
+                scaled_size(img.size, width), Image.LANCZOS, reducing_gap=3.0
+            )
+        for extension, image_format, quality in VARIANT_FORMATS:
+            if resized is img and image_format == 'JPEG':
+                continue
+            buffer = BytesIO()
+            resized.save(buffer, format=image_format, quality=quality)
+            buffer.seek(0)
+            variants.append((extension, width, buffer))
+    return variants
+
+
+def dominant_colour(img):
+    """
+    The most common colour in `img` as a CSS hex string, counted over a
+    32x32 copy reduced to a few colours so near shades count together.
+    """
+    small = img.resize((32, 32), Image.BOX).convert('RGB')
+    palette = small.quantize(colors=8)
+    _, index = max(palette.getcolors())
+    red, green, blue = palette.getpalette()[index * 3:index * 3 + 3]
+    return f"#{red:02x}{green:02x}{blue:02x}"
+
+
+def describe_image(image):
+    """
+    (width, height, dominant colour) of an image already processed and
+    stored. JPEGs are only decoded at 1/8 scale, which is plenty for the
+    colour.
+    """
+    img = Image.open(image)
+    width, height = img.size
+    img.draft('RGB', (32, 32))
+    if img.mode not in ('RGB', 'L'):
+        img = img.convert('RGB')
+    return width, height, dominant_colour(img)
+
+
+def scaled_size(size, max_width):
+    """
+    The (width, height) an image of `size` is resized to so it is no wider
+    than `max_width`, or None when it already fits.
+    """
+    width, height = size
+    if width <= max_width:
+        return None
+    return max_width, int(height / width * max_width)
+
+
+def process_image(image, target_filesize=2.5*1024*1024, max_width=894,
+                  variant_widths=VARIANT_WIDTHS):
+    """
+    Process an uploaded image using Pillow to fit the intrinsic size,
+    compress it, and ensure max width. The image is decoded once; the
+    bytes checked against the target are the bytes stored. Responsive
+    variants are made from the same decoded image.
+    """
+    img = Image.open(image)
+    new_size = scaled_size(img.size, max_width)
+    if new_size:
+        # Large JPEGs decode at 1/2, 1/4 or 1/8 scale straight from the
+        # DCT coefficients, never below the target, so a 4000px phone
+        # photo is never held in memory at full size. No-op for PNGs.
+        img.draft(img.mode, new_size)
+
+    if img.mode in ('RGBA', 'LA') or (
+        img.mode == 'P' and 'transparency' in img.info
+    ):
+        if img.mode == 'P':
+            img = img.convert('RGBA')
+        # Flatten onto white: 'L' for greyscale with alpha, 'RGB' otherwise
+        background = Image.new(img.mode[:-1], img.size, 'white')
+        background.paste(img, img.split()[-1])
+        img = background
+
+    if new_size:
+        # reduce() by whole factors while staying 3x over the target, then
+        # finish with LANCZOS: visually the same for far less work
+        img = img.resize(new_size, Image.LANCZOS, reducing_gap=3.0)
+
+    if img.mode not in ('RGB', 'L'):
+        img = img.convert('RGB')
+
+    buffer, _, _ = compress_jpeg(img, target_filesize)
+    size = buffer.tell()
+    buffer.seek(0)
+
+    variants = encode_variants(img, variant_widths)
+
+    return ProcessedImage(
+        buffer, img.width, img.height, size, 'JPEG', variants,
+        dominant_colour(img)
+    )
+
+
+def process_stored_image(data, target_filesize=2.5*1024*1024, max_width=894,
+                         variant_widths=VARIANT_WIDTHS):
+    """
+    Run the bytes of an image the pipeline already stored through it
+    again. A stored JPEG that still fits the size limits is kept byte for
+    byte and only its variants and metadata are made again, so rerunning
+    adds no JPEG generation loss: its quality is the ceiling for every
+    later run. Anything else goes through process_image, once.
+    """
+    img = Image.open(BytesIO(data))
+    if (
+        img.format != 'JPEG' or img.mode not in ('RGB', 'L')
+        or len(data) > target_filesize
+        or scaled_size(img.size, max_width)
+    ):
+        return process_image(
+            BytesIO(data), target_filesize, max_width, variant_widths
+        )
+    img.load()
+    return ProcessedImage(
+        BytesIO(data), img.width, img.height, len(data), 'JPEG',
+        encode_variants(img, variant_widths), dominant_colour(img)
+    )
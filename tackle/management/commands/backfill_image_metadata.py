@@ -0,0 +1,70 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+
+from tackle.image_queue import METADATA_FIELDS
+from tackle.images import describe_image
+from tackle.models import ImageStatus, ProductImage
+
+logger = logging.getLogger(__name__)
+
+
+def read_metadata(image):
+    """
+    Fill in an image's dimensions, byte size and dominant colour from its
+    stored file. Returns the image, or None if the file cannot be read.
+    """
+    try:
+        with default_storage.open(image.image.name) as stored:
+            data = stored.read()
+        image.width, image.height, image.dominant_colour = describe_image(
+            BytesIO(data)
+        )
+    except Exception:
+        logger.exception("Could not read product image %s", image.pk)
+        return None
+    image.size = len(data)
+    return image
+
+
+class Command(BaseCommand):
+    """
+    Records width, height, byte size and dominant colour for ready images
+    stored before they were saved at processing time. Files are read on a
+    thread pool in id-ordered batches and each batch is saved with one
+    bulk update. Images that already have them are skipped, so the
+    command can be stopped and run again.
+    """
+    help = "Backfill dimensions and colours of stored product images."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument(
+            '--threads', type=int, default=settings.IMAGE_PROCESSING_THREADS
+        )
+
+    def handle(self, *args, **options):
+        images = ProductImage.objects.filter(
+            status=ImageStatus.READY, width__isnull=True
+        ).exclude(image='').only('id', 'image').order_by('id')
+        last_id = updated = failed = 0
+        with ThreadPoolExecutor(max_workers=options['threads']) as pool:
+            while True:
+                batch = list(
+                    images.filter(id__gt=last_id)[:options['batch_size']]
+                )
+                if not batch:
+                    break
+                last_id = batch[-1].id
+                described = [
+                    image for image in pool.map(read_metadata, batch)
+                    if image is not None
+                ]
+                ProductImage.objects.bulk_update(described, METADATA_FIELDS)
+                updated += len(described)
+                failed += len(batch) - len(described)
+        self.stdout.write(f"Updated {updated} images, {failed} failed.")
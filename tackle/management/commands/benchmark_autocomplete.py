@@ -0,0 +1,114 @@
+import random
+import statistics
+import string
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from tackle.autocomplete import PrefixIndex, get_prefix_index
+from tackle.models import Brand
+from tackle.search import suggest_names
+
+
+class Command(BaseCommand):
+    """
+    Seeds a throwaway set of brands and times an autocomplete lookup
+    through the ORM against the in-memory prefix index. Runs on a test
+    database created for the run and destroyed afterwards, so live tables
+    are never written to. --i-know-this-locks-production runs it on the
+    configured database instead, in one transaction that is rolled back.
+    """
+    help = "Benchmark brand autocomplete: ORM queries vs the prefix index."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--brands', type=int, default=5000)
+        parser.add_argument('--lookups', type=int, default=500)
+        parser.add_argument(
+            '--i-know-this-locks-production', action='store_true',
+            help="Use the configured database rather than a test database."
+        )
+        parser.add_argument(
+            '--noinput', '--no-input', action='store_false',
+            dest='interactive',
+            help="Replace a test database left by an earlier run without "
+                 "asking."
+        )
+
+    def handle(self, *args, **options):
+        if options['i_know_this_locks_production']:
+            return self.benchmark(options)
+        old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=not options['interactive']
+        )
+        try:
+            self.benchmark(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def benchmark(self, options):
+        rng = random.Random(1)
+        with transaction.atomic():
+            names = self.seed(rng, options['brands'])
+            terms = [
+                rng.choice(names)[:rng.randint(1, 4)]
+                for _ in range(options['lookups'])
+            ]
+            limit = settings.AUTOCOMPLETE_LIMIT
+
+            start = time.perf_counter()
+            index = PrefixIndex(Brand.objects.values_list('name', flat=True))
+            build_ms = (time.perf_counter() - start) * 1000
+            get_prefix_index(Brand)
+
+            paths = {
+                'orm icontains': lambda term: list(
+                    Brand.objects.filter(name__icontains=term).values_list(
+                        'name', flat=True
+                    )[:limit]
+                ),
+                'orm trigram': lambda term: suggest_names(Brand, term, limit),
+                'prefix index': lambda term: index.search(term, limit),
+                'prefix index + version': lambda term: get_prefix_index(
+                    Brand
+                ).search(term, limit),
+            }
+
+            self.stdout.write(
+                f"{options['brands']} brands on {connection.vendor}, "
+                f"{len(terms)} lookups, index built in {build_ms:.1f} ms\n"
+            )
+            for name, lookup in paths.items():
+                timings = []
+                for term in terms:
+                    start = time.perf_counter()
+                    lookup(term)
+                    timings.append((time.perf_counter() - start) * 1000000)
+                self.stdout.write(
+                    f"  {name:<24} median {statistics.median(timings):>9.1f} "
+                    f"us  p95 {self.percentile(timings, 95):>9.1f} us"
+                )
+
+            transaction.set_rollback(True)
+
+    def seed(self, rng, count):
+        """
+        Bulk insert `count` brands with one or two made up words each.
+        """
+        def word():
+            length = rng.randint(3, 9)
+            return ''.join(rng.choices(string.ascii_lowercase, k=length))
+
+        names = [
+            ' '.join(word().title() for _ in range(rng.randint(1, 2)))
+            for _ in range(count)
+        ]
+        Brand.objects.bulk_create([Brand(name=name) for name in names])
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE tackle_brand')
+        return names
+
+    def percentile(self, values, percent):
+        ordered = sorted(values)
+        return ordered[min(len(ordered) - 1, len(ordered) * percent // 100)]
@@ -0,0 +1,187 @@
+import random
+import statistics
+import time
+from decimal import Decimal
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+
+from auth_app.models import CustomUser
+from tackle.facets import facet_rows
+from tackle.models import (
+    Brand, Category, Condition, FinancialStatus, Product, ProductVisibility
+)
+from tackle.pagination import KeysetPaginator, encode_cursor
+
+
+class Command(BaseCommand):
+    """
+    Seeds a large throwaway catalog and times the public catalog queries
+    with and without the partial indexes on Product, printing the query
+    plan for each. Dropping the indexes locks the product table, so the
+    benchmark runs on a test database created for the run and destroyed
+    afterwards. --i-know-this-locks-production runs it on the configured
+    database instead, in one transaction that is rolled back.
+    """
+    help = "Benchmark catalog queries with and without the product indexes."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--products', type=int, default=50000)
+        parser.add_argument('--runs', type=int, default=5)
+        parser.add_argument(
+            '--no-plans', action='store_true',
+            help="Only print timings, not query plans."
+        )
+        parser.add_argument(
+            '--i-know-this-locks-production', action='store_true',
+            help="Use the configured database rather than a test database."
+        )
+        parser.add_argument(
+            '--noinput', '--no-input', action='store_false',
+            dest='interactive',
+            help="Replace a test database left by an earlier run without "
+                 "asking."
+        )
+
+    def handle(self, *args, **options):
+        if options['i_know_this_locks_production']:
+            return self.benchmark(options)
+        old_name = connection.creation.create_test_db(
+            verbosity=0, autoclobber=not options['interactive']
+        )
+        try:
+            self.benchmark(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def benchmark(self, options):
+        with transaction.atomic():
+            queries = self.seed(options['products'])
+            self.stdout.write(
+                f"Seeded {options['products']} products on "
+                f"{connection.vendor}."
+            )
+
+            self.drop_indexes()
+            before = self.run(queries, options, "without indexes")
+            self.create_indexes()
+            after = self.run(queries, options, "with indexes")
+
+            self.stdout.write("\nSummary (median ms)")
+            for name in queries:
+                self.stdout.write(
+                    f"  {name:<22} {before[name]:>9.2f} -> {after[name]:>9.2f}"
+                )
+
+            transaction.set_rollback(True)
+
+    def seed(self, count):
+        """
+        Bulk insert brands, categories and products, and return the named
+        querysets to benchmark.
+        """
+        rng = random.Random(1)
+        user = CustomUser.objects.create(
+            email='catalog-benchmark@example.com',
+            username='catalog-benchmark'
+        )
+        brands = Brand.objects.bulk_create(
+            [Brand(name=f"Brand {i}") for i in range(200)]
+        )
+        categories = Category.objects.bulk_create(
+            [Category(name=f"Category {i}") for i in range(40)]
+        )
+        conditions = [condition.value for condition in Condition]
+
+        batch = []
+        for i in range(count):
+            batch.append(Product(
+                brand=rng.choice(brands),
+                category=rng.choice(categories),
+                name=f"Benchmark product {i}",
+                slug=f"catalog-benchmark-{i}",
+                condition=rng.choice(conditions),
+                user=user,
+                price=Decimal(rng.randint(100, 50000)) / 100,
+                visibility=(
+                    ProductVisibility.LIVE if rng.random() < 0.8
+                    else ProductVisibility.DRAFT
+                ),
+                financial_status=(
+                    FinancialStatus.SOLD if rng.random() < 0.3
+                    else FinancialStatus.UNSOLD
+                ),
+            ))
+            if len(batch) == 5000:
+                Product.objects.bulk_create(batch)
+                batch = []
+        Product.objects.bulk_create(batch)
+
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                # Check the deferred foreign keys now, as Postgres will not
+                # rebuild indexes on a table with pending trigger events
+                cursor.execute('SET CONSTRAINTS ALL IMMEDIATE')
+        self.analyze()
+
+        live = Product.objects.live()
+        ordered = live.order_by(*KeysetPaginator.ordering)
+        deep_row = ordered[count // 4]
+        deep_cursor = encode_cursor(deep_row.created_at, deep_row.pk)
+        return {
+            'home first page': KeysetPaginator(live, 12).get_queryset(),
+            'home deep page': KeysetPaginator(live, 12).get_queryset(
+                deep_cursor
+            ),
+            'shop price range': ordered.filter(price__lte=Decimal('20'))[:24],
+            'shop brand': ordered.filter(brand=brands[0])[:24],
+            'shop category': ordered.filter(category=categories[0])[:24],
+            'facets one category': facet_rows(
+                live.filter(category=categories[0])
+            ),
+        }
+
+    def run(self, queries, options, label):
+        """
+        Time each query and print its plan. Returns median ms per query.
+        """
+        self.stdout.write(f"\n=== {label} ===")
+        medians = {}
+        for name, queryset in queries.items():
+            list(queryset.all())
+            timings = []
+            for _ in range(options['runs']):
+                start = time.perf_counter()
+                list(queryset.all())
+                timings.append((time.perf_counter() - start) * 1000)
+            medians[name] = statistics.median(timings)
+            self.stdout.write(f"\n{name}: median {medians[name]:.2f} ms")
+            if not options['no_plans']:
+                self.stdout.write(queryset.explain())
+        return medians
+
+    def drop_indexes(self):
+        """
+        Drop the catalog indexes inside the benchmark transaction.
+        """
+        with connection.schema_editor() as editor:
+            for index in Product._meta.indexes:
+                editor.remove_index(Product, index)
+        self.analyze()
+
+    def create_indexes(self):
+        """
+        Put the catalog indexes back before the second run.
+        """
+        with connection.schema_editor() as editor:
+            for index in Product._meta.indexes:
+                editor.add_index(Product, index)
+        self.analyze()
+
+    def analyze(self):
+        """
+        Refresh planner statistics so each run gets a fair plan.
+        """
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('ANALYZE tackle_product')
@@ -0,0 +1,137 @@
+import multiprocessing
+import os
+import random
+import resource
+import statistics
+import time
+from io import BytesIO
+
+from django.core.management.base import BaseCommand, CommandError
+from PIL import Image
+
+from tackle.images import compress_jpeg, process_image, scaled_size
+from tackle.management.commands.benchmark_image_processing import (
+    IMAGE_EXTENSIONS, synthetic_photo
+)
+
+TARGET_FILESIZE = 2.5 * 1024 * 1024
+MAX_WIDTH = 894
+
+
+def full_decode(data):
+    """
+    process_image as it was: decode at full size, then one LANCZOS pass.
+    """
+    img = Image.open(BytesIO(data))
+    new_size = scaled_size(img.size, MAX_WIDTH)
+    if new_size:
+        img = img.resize(new_size, Image.LANCZOS)
+    return compress_jpeg(img, TARGET_FILESIZE)
+
+
+def draft_decode(data):
+    """
+    process_image as it is now, with draft() and reducing_gap. Responsive
+    variants are left out to compare like with like.
+    """
+    return process_image(
+        BytesIO(data), TARGET_FILESIZE, MAX_WIDTH, variant_widths=()
+    )
+
+
+PIPELINES = {'full decode': full_decode, 'draft decode': draft_decode}
+
+
+def peak_rss_kb():
+    """
+    Peak resident set of this process in KB, from /proc on Linux.
+    """
+    with open('/proc/self/status') as status:
+        for line in status:
+            if line.startswith('VmHWM:'):
+                return int(line.split()[1])
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def measure(name, data, results):
+    """
+    Run one upload through a pipeline in this fresh process and report the
+    CPU time and how far it pushed the peak RSS above the idle process.
+    """
+    # Linux keeps the parent's high-water mark across exec; reset it
+    with open('/proc/self/clear_refs', 'w') as clear_refs:
+        clear_refs.write('5')
+    baseline = peak_rss_kb()
+    start = time.process_time()
+    PIPELINES[name](data)
+    cpu = time.process_time() - start
+    results.put((cpu * 1000, (peak_rss_kb() - baseline) / 1024))
+
+
+class Command(BaseCommand):
+    """
+    Runs each upload through process_image with and without decode-time
+    downscaling, each in a fresh process so peak RSS is per upload, and
+    reports the CPU time and peak memory saved. Needs Linux for /proc.
+    """
+    help = "Benchmark peak RSS and CPU of process_image per upload."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--corpus', help="Folder of JPEG/PNG photos to benchmark."
+        )
+        parser.add_argument('--synthetic', type=int, default=6)
+
+    def handle(self, *args, **options):
+        uploads = self.load_uploads(options)
+        context = multiprocessing.get_context('spawn')
+        stats = {}
+        for name in PIPELINES:
+            cpu, rss = [], []
+            for data in uploads:
+                results = context.Queue()
+                process = context.Process(
+                    target=measure, args=(name, data, results)
+                )
+                process.start()
+                upload_cpu, upload_rss = results.get()
+                process.join()
+                cpu.append(upload_cpu)
+                rss.append(upload_rss)
+            stats[name] = statistics.mean(cpu), statistics.mean(rss)
+            self.stdout.write(
+                f"{name:<13} cpu/upload {stats[name][0]:7.1f} ms  "
+                f"peak rss/upload {stats[name][1]:6.1f} MB"
+            )
+
+        full_cpu, full_rss = stats['full decode']
+        draft_cpu, draft_rss = stats['draft decode']
+        self.stdout.write(
+            f"saved per upload: {full_cpu - draft_cpu:.1f} ms cpu "
+            f"({1 - draft_cpu / full_cpu:.0%}), "
+            f"{full_rss - draft_rss:.1f} MB peak rss "
+            f"({1 - draft_rss / full_rss:.0%})"
+        )
+
+    def load_uploads(self, options):
+        """
+        Raw bytes of every photo in --corpus, or synthetic 12MP JPEGs.
+        """
+        if options['corpus']:
+            if not os.path.isdir(options['corpus']):
+                raise CommandError(f"{options['corpus']} is not a folder.")
+            uploads = []
+            for name in sorted(os.listdir(options['corpus'])):
+                if name.lower().endswith(IMAGE_EXTENSIONS):
+                    path = os.path.join(options['corpus'], name)
+                    with open(path, 'rb') as photo:
+                        uploads.append(photo.read())
+            return uploads
+
+        rng = random.Random(1)
+        uploads = []
+        for _ in range(options['synthetic']):
+            buffer = BytesIO()
+            synthetic_photo(rng).save(buffer, format='JPEG', quality=92)
+            uploads.append(buffer.getvalue())
+        return uploads
@@ -0,0 +1,119 @@
+import os
+import random
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from PIL import Image, ImageDraw, ImageFilter
+
+from tackle.images import MIN_JPEG_QUALITY, compress_jpeg, encode_jpeg
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+
+
+def linear_quality_search(img, target_filesize):
+    """
+    The original loop from process_image: step down from quality 100 in
+    twos until the encoding fits. Returns (buffer, quality, encodes).
+    """
+    quality = 100
+    buffer = encode_jpeg(img, quality)
+    encodes = 1
+    while buffer.tell() > target_filesize and quality > MIN_JPEG_QUALITY:
+        quality -= 2
+        buffer = encode_jpeg(img, quality)
+        encodes += 1
+    return buffer, quality, encodes
+
+
+def synthetic_photo(rng):
+    """
+    A 4032x3024 stand-in for a phone photo: a smooth background, some
+    solid shapes and sensor-like noise, which is what makes real photos
+    expensive to compress.
+    """
+    size = (4032, 3024)
+    img = Image.linear_gradient('L').resize(size).convert('RGB')
+    draw = ImageDraw.Draw(img)
+    for _ in range(rng.randint(5, 25)):
+        x, y = rng.randrange(size[0]), rng.randrange(size[1])
+        draw.ellipse(
+            (x, y, x + rng.randint(100, 1500), y + rng.randint(50, 800)),
+            fill=tuple(rng.randrange(256) for _ in range(3))
+        )
+    img = img.filter(ImageFilter.GaussianBlur(rng.randint(0, 4)))
+    noise = Image.effect_noise(size, rng.randint(5, 60)).convert('RGB')
+    return Image.blend(img, noise, rng.uniform(0.05, 0.4))
+
+
+class Command(BaseCommand):
+    """
+    Compares the old linear JPEG quality loop with the galloping search in
+    compress_jpeg over a folder of photos, or synthetic phone-sized photos
+    when no folder is given. Images are resized to the listing width
+    first, as process_image does, and only the quality search is timed.
+    """
+    help = "Benchmark JPEG quality selection: encodes per image and time."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--corpus', help="Folder of JPEG/PNG photos to benchmark."
+        )
+        parser.add_argument('--synthetic', type=int, default=12)
+        parser.add_argument(
+            '--target-kb', type=int, action='append',
+            help="Target size in KB; repeat for several. Defaults to the "
+                 "2560 KB process_image uses plus 150 and 60 KB."
+        )
+        parser.add_argument('--max-width', type=int, default=894)
+
+    def handle(self, *args, **options):
+        images = self.load_corpus(options)
+        targets = options['target_kb'] or [2560, 150, 60]
+        self.stdout.write(f"{len(images)} images at {options['max_width']}px")
+
+        for target_kb in targets:
+            self.stdout.write(f"\nTarget {target_kb} KB")
+            for name, search in (
+                ('linear', linear_quality_search),
+                ('gallop', compress_jpeg),
+            ):
+                encodes, timings, over = [], [], 0
+                for img in images:
+                    start = time.perf_counter()
+                    buffer, _, count = search(img, target_kb * 1024)
+                    timings.append((time.perf_counter() - start) * 1000)
+                    encodes.append(count)
+                    over += buffer.tell() > target_kb * 1024
+                self.stdout.write(
+                    f"  {name:<7} encodes/image mean "
+                    f"{statistics.mean(encodes):5.1f} max {max(encodes):3d}"
+                    f"  ms/image mean {statistics.mean(timings):7.1f}"
+                    f"  total {sum(timings):8.0f} ms  over target {over}"
+                )
+
+    def load_corpus(self, options):
+        """
+        Open and resize every photo in --corpus, or build synthetic ones.
+        """
+        if options['corpus']:
+            if not os.path.isdir(options['corpus']):
+                raise CommandError(f"{options['corpus']} is not a folder.")
+            paths = sorted(
+                os.path.join(options['corpus'], name)
+                for name in os.listdir(options['corpus'])
+                if name.lower().endswith(IMAGE_EXTENSIONS)
+            )
+            images = [Image.open(path).convert('RGB') for path in paths]
+        else:
+            rng = random.Random(1)
+            images = [
+                synthetic_photo(rng) for _ in range(options['synthetic'])
+            ]
+        return [self.resize(img, options['max_width']) for img in images]
+
+    def resize(self, img, max_width):
+        if img.width <= max_width:
+            return img
+        height = int(img.height / img.width * max_width)
+        return img.resize((max_width, height), Image.LANCZOS)
@@ -0,0 +1,97 @@
+import os
+import random
+import shutil
+import statistics
+import tempfile
+import time
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.test.utils import override_settings
+
+from auth_app.models import CustomUser
+from tackle.image_queue import process_images_now
+from tackle.management.commands.benchmark_image_processing import (
+    synthetic_photo
+)
+from tackle.models import Brand, Category, Product
+
+
+class Command(BaseCommand):
+    """
+    Times processing a listing's photos in the request, one at a time and
+    on the thread pool, for 1, 4 and 10 synthetic 12MP phone photos.
+    Images are stored on a throwaway local filesystem and the database
+    work is rolled back.
+    """
+    help = "Benchmark in-request processing of a listing's photos."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--counts', type=int, nargs='+', default=[1, 4, 10]
+        )
+        parser.add_argument('--runs', type=int, default=3)
+        parser.add_argument(
+            '--threads', type=int, default=settings.IMAGE_PROCESSING_THREADS
+        )
+
+    def handle(self, *args, **options):
+        rng = random.Random(1)
+        photos = []
+        for _ in range(max(options['counts'])):
+            buffer = BytesIO()
+            synthetic_photo(rng).save(buffer, format='JPEG', quality=92)
+            photos.append(buffer.getvalue())
+
+        media_root = tempfile.mkdtemp()
+        storage = 'django.core.files.storage.FileSystemStorage'
+        try:
+            with override_settings(
+                DEFAULT_FILE_STORAGE=storage, MEDIA_ROOT=media_root
+            ), transaction.atomic():
+                product = self.create_product()
+                self.stdout.write(
+                    f"Median of {options['runs']} runs, "
+                    f"{options['threads']} threads, {os.cpu_count()} CPUs"
+                )
+                for count in options['counts']:
+                    serial = self.time(product, photos[:count], 1, options)
+                    pooled = self.time(
+                        product, photos[:count], options['threads'], options
+                    )
+                    self.stdout.write(
+                        f"  {count:>2} images  serial {serial:7.0f} ms  "
+                        f"pool {pooled:7.0f} ms  ({serial / pooled:.1f}x)"
+                    )
+                transaction.set_rollback(True)
+        finally:
+            shutil.rmtree(media_root, ignore_errors=True)
+
+    def create_product(self):
+        user = CustomUser.objects.create(
+            email='listing-benchmark@example.com',
+            username='listing-benchmark'
+        )
+        return Product.objects.create(
+            brand=Brand.objects.create(name="Benchmark brand"),
+            category=Category.objects.create(name="Benchmark category"),
+            name="Benchmark listing", condition="Good", user=user
+        )
+
+    def time(self, product, photos, threads, options):
+        """
+        Median ms to process and store `photos` with `threads` threads.
+        """
+        timings = []
+        for _ in range(options['runs']):
+            uploads = [
+                SimpleUploadedFile(f"photo{i}.jpg", data, 'image/jpeg')
+                for i, data in enumerate(photos)
+            ]
+            start = time.perf_counter()
+            process_images_now(product, uploads, threads=threads)
+            timings.append((time.perf_counter() - start) * 1000)
+        return statistics.median(timings)
@@ -0,0 +1,83 @@
+import hashlib
+import time
+
+from django.core.management.base import BaseCommand
+from storages.backends.s3boto3 import S3Boto3Storage
+
+from tackle.images import VARIANT_FORMATS, VARIANT_WIDTHS
+from tackle.models import ImageBlob
+from tackle.storage import MediaStorage
+
+
+def blob_name(key, extension):
+    digest = hashlib.sha256(key.encode()).hexdigest()
+    return (
+        f"{ImageBlob.PREFIX}{digest[:2]}/{digest[2:4]}/{digest}.{extension}"
+    )
+
+
+def image_names(count):
+    """
+    Blob names for `count` images: the image plus each of its variants,
+    as the product cards ask for them.
+    """
+    names = []
+    for i in range(count):
+        names.append(blob_name(str(i), 'jpg'))
+        for width in VARIANT_WIDTHS:
+            for extension, _, _ in VARIANT_FORMATS:
+                names.append(blob_name(f"{i}-{width}", extension))
+    return names
+
+
+class Command(BaseCommand):
+    """
+    Times building the media URLs for 1,000 product images, main image
+    and variants, with the stock S3 storage and with MediaStorage's
+    remembered URLs, cold and warm. No requests are made to S3.
+    """
+    help = "Benchmark media URL generation per 1,000 images."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--images', type=int, default=1000)
+        parser.add_argument('--runs', type=int, default=5)
+
+    def handle(self, *args, **options):
+        names = image_names(options['images'])
+        per_thousand = 1000 / options['images']
+        self.stdout.write(
+            f"{options['images']} images, {len(names)} URLs, "
+            f"best of {options['runs']} runs, ms per 1,000 images"
+        )
+
+        stock = S3Boto3Storage()
+        timings = {
+            'S3Boto3Storage': self.best(stock, names, options['runs']),
+        }
+        cold = []
+        for _ in range(options['runs']):
+            storage = MediaStorage()
+            cold.append(self.time_urls(storage, names))
+        timings['MediaStorage cold'] = min(cold)
+        timings['MediaStorage warm'] = self.best(
+            storage, names, options['runs']
+        )
+
+        baseline = timings['S3Boto3Storage']
+        for name, seconds in timings.items():
+            self.stdout.write(
+                f"  {name:<18} {seconds * 1000 * per_thousand:8.2f} ms"
+                f"  ({baseline / seconds:5.1f}x)"
+            )
+        urls = [stock.url(name) for name in names]
+        if urls != [storage.url(name) for name in names]:
+            self.stderr.write("MediaStorage URLs differ from S3Boto3Storage")
+
+    def best(self, storage, names, runs):
+        return min(self.time_urls(storage, names) for _ in range(runs))
+
+    def time_urls(self, storage, names):
+        start = time.perf_counter()
+        for name in names:
+            storage.url(name)
+        return time.perf_counter() - start
@@ -0,0 +1,97 @@
+import time
+from types import SimpleNamespace
+
+from django.conf import settings
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.contrib.sessions.models import Session
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory
+from django.test.utils import override_settings
+
+from tackle.cart import Cart
+from tackle.models import Product
+from tackle.sessions import write_behind
+
+ENGINES = {
+    'db': 'django.contrib.sessions.backends.db',
+    'cached_db': 'django.contrib.sessions.backends.cached_db',
+    'tackle.sessions': 'tackle.sessions',
+}
+
+
+class Command(BaseCommand):
+    """
+    Measures cart operations per second through SessionMiddleware with
+    each session engine. Every operation is a request from a logged in
+    shopper: add a product, remove it, and save the cart unchanged.
+    --latency-ms adds a delay to each query, standing in for the round
+    trip to a remote database. Sessions created are deleted afterwards.
+    """
+    help = "Benchmark cart operations per second under each session engine."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--ops', type=int, default=600)
+        parser.add_argument('--latency-ms', type=float, default=0)
+
+    def handle(self, *args, **options):
+        delay = options['latency_ms'] / 1000
+        self.stdout.write(
+            f"{options['ops']} cart operations, "
+            f"{options['latency_ms']} ms added per query"
+        )
+
+        def slow_query(execute, sql, params, many, context):
+            time.sleep(delay)
+            return execute(sql, params, many, context)
+
+        for name, engine in ENGINES.items():
+            with override_settings(SESSION_ENGINE=engine):
+                queries = []
+
+                def count_query(execute, sql, params, many, context):
+                    if 'django_session' in sql:
+                        queries.append(sql)
+                    return slow_query(execute, sql, params, many, context)
+
+                with connection.execute_wrapper(count_query):
+                    seconds, session_key = self.run_ops(options['ops'])
+                write_behind.flush()
+                Session.objects.filter(session_key=session_key).delete()
+
+            self.stdout.write(
+                f"  {name:<16} {options['ops'] / seconds:8.0f} ops/s  "
+                f"{len(queries) / options['ops']:5.2f} session queries/op"
+            )
+
+    def run_ops(self, count):
+        """
+        Run `count` cart requests on one session. Returns the seconds
+        taken and the session key.
+        """
+        factory = RequestFactory()
+        middleware = SessionMiddleware(lambda request: HttpResponse())
+        user = SimpleNamespace(is_authenticated=True)
+        product = Product(id=1, shipping=2)
+        session_key = None
+
+        start = time.perf_counter()
+        for i in range(count):
+            request = factory.post('/cart/')
+            if session_key:
+                request.COOKIES[settings.SESSION_COOKIE_NAME] = session_key
+            request.user = user
+            middleware.process_request(request)
+            cart = Cart(request)
+            if i % 3 == 0:
+                cart.add(product, price=10)
+            elif i % 3 == 1:
+                cart.remove(product)
+            else:
+                cart.save()
+            response = middleware.process_response(request, HttpResponse())
+            cookie = response.cookies.get(settings.SESSION_COOKIE_NAME)
+            if cookie:
+                session_key = cookie.value
+        return time.perf_counter() - start, session_key
@@ -0,0 +1,72 @@
+import multiprocessing
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from tackle.image_queue import run_worker
+from tackle.models import ImageStatus, ProductImage
+
+
+def worker(once, interval):
+    """
+    Entry point for each forked worker process.
+    """
+    run_worker(once=once, interval=interval)
+
+
+class Command(BaseCommand):
+    """
+    Runs the product image worker pool. Each worker claims pending images
+    and processes them into storage until stopped, or until the queue is
+    empty with --once.
+    """
+    help = "Process pending product image uploads."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=settings.IMAGE_WORKERS,
+            help="Worker processes to run. 0 processes in this process."
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help="Exit once the queue is empty."
+        )
+        parser.add_argument(
+            '--retry-failed', action='store_true',
+            help="Queue failed images again before starting."
+        )
+        parser.add_argument(
+            '--interval', type=float, default=2,
+            help="Seconds between polls while the queue is empty."
+        )
+
+    def handle(self, *args, **options):
+        once, interval = options['once'], options['interval']
+        if options['retry_failed']:
+            retried = ProductImage.objects.filter(
+                status=ImageStatus.FAILED
+            ).exclude(pending_file='').update(status=ImageStatus.PENDING)
+            self.stdout.write(f"Queued {retried} failed images again.")
+
+        if options['workers'] == 0:
+            processed = run_worker(once=once, interval=interval)
+            self.stdout.write(f"Processed {processed} images.")
+            return
+
+        # Forked workers must open their own database connections
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        processes = [
+            context.Process(target=worker, args=(once, interval))
+            for _ in range(options['workers'])
+        ]
+        for process in processes:
+            process.start()
+        self.stdout.write(f"Started {len(processes)} image workers.")
+        try:
+            for process in processes:
+                process.join()
+        except KeyboardInterrupt:
+            for process in processes:
+                process.terminate()
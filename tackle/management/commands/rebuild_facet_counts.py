@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from tackle.facets import rebuild_facet_counts
+
+
+class Command(BaseCommand):
+    """
+    Rebuilds the FacetCount rollup from the products table. Use it after
+    bulk imports or any change made with queryset.update(), which skips
+    the signals that keep the rollup current.
+    """
+    help = "Rebuild the shop facet count rollup from scratch."
+
+    def handle(self, *args, **options):
+        rows = rebuild_facet_counts()
+        self.stdout.write(
+            self.style.SUCCESS(f"Rebuilt facet counts: {rows} rows.")
+        )
@@ -0,0 +1,187 @@
+import json
+import logging
+import multiprocessing
+import os
+import time
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from tackle.image_queue import reprocess_image
+from tackle.images import process_stored_image
+from tackle.models import ImageStatus, ProductImage
+
+logger = logging.getLogger(__name__)
+
+
+def reprocess(task):
+    """
+    Pool entry point: run one image's stored bytes through the current
+    pipeline. Returns (image id, ProcessedImage or None on failure).
+    """
+    image_id, data = task
+    try:
+        return image_id, process_stored_image(data)
+    except Exception:
+        logger.exception("Could not reprocess product image %s", image_id)
+        return image_id, None
+
+
+class Command(BaseCommand):
+    """
+    Regenerates the stored files of every ready product image with the
+    current image pipeline, after it changes. Stored JPEGs that still fit
+    the pipeline's limits are kept as they are and only their variants
+    and metadata are regenerated, so running it again never degrades
+    them. Images are read in id order in batches and processed on a pool
+    of worker processes. The last id done is saved to a checkpoint file
+    after each batch, so an interrupted run carries on where it stopped;
+    the file is removed once every image has been done.
+    """
+    help = "Reprocess stored product images with the current pipeline."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count(),
+            help="Worker processes. 0 processes in this process."
+        )
+        parser.add_argument('--batch-size', type=int, default=50)
+        parser.add_argument(
+            '--limit', type=int,
+            help="Stop after this many images, for a canary run."
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help="Report what would be reprocessed and change nothing."
+        )
+        parser.add_argument(
+            '--checkpoint',
+            default=os.path.join(settings.BASE_DIR, 'reprocess-images.json'),
+            help="File recording progress between runs."
+        )
+        parser.add_argument(
+            '--restart', action='store_true',
+            help="Ignore the checkpoint and start from the first image."
+        )
+
+    def handle(self, *args, **options):
+        checkpoint = options['checkpoint']
+        last_id = 0 if options['restart'] else self.read_checkpoint(
+            checkpoint
+        )
+        if last_id:
+            self.stdout.write(f"Resuming after image {last_id}.")
+
+        if options['dry_run'] or options['workers'] == 0:
+            pool = None
+            map_tasks = map
+        else:
+            # Forked workers must not share this process's connections
+            connections.close_all()
+            pool = multiprocessing.get_context('fork').Pool(
+                options['workers']
+            )
+            map_tasks = pool.imap
+
+        images = ProductImage.objects.filter(
+            status=ImageStatus.READY
+        ).exclude(image='').order_by('id')
+        remaining = options['limit']
+        done = failed = 0
+        start = time.perf_counter()
+        try:
+            while remaining is None or remaining > 0:
+                size = options['batch_size']
+                if remaining is not None:
+                    size = min(size, remaining)
+                batch = list(
+                    images.filter(id__gt=last_id).values_list(
+                        'id', 'image'
+                    )[:size]
+                )
+                if not batch:
+                    break
+                if remaining is not None:
+                    remaining -= len(batch)
+
+                if options['dry_run']:
+                    done += len(batch)
+                    last_id = batch[-1][0]
+                    continue
+
+                batch_done, batch_failed = self.reprocess_batch(
+                    batch, map_tasks
+                )
+                done += batch_done
+                failed += batch_failed
+                last_id = batch[-1][0]
+                self.write_checkpoint(checkpoint, last_id)
+                elapsed = time.perf_counter() - start
+                self.stdout.write(
+                    f"up to image {last_id}: {done} done, {failed} failed, "
+                    f"{done / elapsed:.1f} images/s"
+                )
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+
+        if options['dry_run']:
+            self.stdout.write(f"Would reprocess {done} images.")
+            return
+        if not images.filter(id__gt=last_id).exists():
+            self.clear_checkpoint(checkpoint)
+        elapsed = time.perf_counter() - start
+        self.stdout.write(
+            f"Reprocessed {done} images, {failed} failed, in {elapsed:.1f}s "
+            f"({done / elapsed if elapsed else 0:.1f} images/s)."
+        )
+
+    def reprocess_batch(self, batch, map_tasks):
+        """
+        Read a batch's stored files, process them on the pool and swap the
+        results in. Returns (done, failed).
+        """
+        sources, tasks, failed = {}, [], 0
+        for image_id, name in batch:
+            try:
+                with default_storage.open(name) as stored:
+                    tasks.append((image_id, stored.read()))
+            except Exception:
+                logger.exception("Could not read product image %s", image_id)
+                failed += 1
+                continue
+            sources[image_id] = name
+
+        done = 0
+        for image_id, processed in map_tasks(reprocess, tasks):
+            if processed is None:
+                failed += 1
+            elif reprocess_image(image_id, sources[image_id], processed):
+                done += 1
+        return done, failed
+
+    def read_checkpoint(self, path):
+        """
+        The last image id a previous run finished, or 0.
+        """
+        try:
+            with open(path) as checkpoint:
+                return json.load(checkpoint)['last_id']
+        except FileNotFoundError:
+            return 0
+
+    def write_checkpoint(self, path, last_id):
+        """
+        Save progress, replacing the file whole so a crash cannot leave
+        it half written.
+        """
+        with open(f"{path}.tmp", 'w') as checkpoint:
+            json.dump({'last_id': last_id}, checkpoint)
+        os.replace(f"{path}.tmp", path)
+
+    def clear_checkpoint(self, path):
+        if os.path.exists(path):
+            os.remove(path)
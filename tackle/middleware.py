@@ -0,0 +1,33 @@
+from django.conf import settings
+
+
+class CartCookieMiddleware:
+    """
+    Writes changes to an anonymous shopper's cart cookie to the response.
+    An empty value deletes the cookie.
+    """
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        response = self.get_response(request)
+        value = getattr(request, 'cart_cookie', None)
+        if value is None:
+            return response
+        if not value:
+            response.delete_cookie(
+                settings.CART_COOKIE_NAME, samesite='Lax'
+            )
+            return response
+        response.set_cookie(
+            settings.CART_COOKIE_NAME,
+            value,
+            max_age=(
+                None if settings.SESSION_EXPIRE_AT_BROWSER_CLOSE
+                else settings.SESSION_COOKIE_AGE
+            ),
+            secure=settings.SESSION_COOKIE_SECURE,
+            httponly=True,
+            samesite='Lax',
+        )
+        return response
@@ -0,0 +1,78 @@
+# Generated by Django 4.2.5 on 2026-10-18 11:32
+
+from decimal import Decimal
+
+from django.db import migrations, models
+from django.db.models import Case, CharField, Count, Value, When
+import django.db.models.deletion
+
+
+def populate_facet_counts(apps, schema_editor):
+    Product = apps.get_model("tackle", "Product")
+    FacetCount = apps.get_model("tackle", "FacetCount")
+    # The price bands as they were when this migration was written
+    price_band = Case(
+        When(price__lt=Decimal("25"), then=Value("under-25")),
+        When(price__lt=Decimal("50"), then=Value("25-50")),
+        When(price__lt=Decimal("100"), then=Value("50-100")),
+        When(price__lt=Decimal("250"), then=Value("100-250")),
+        default=Value("250-plus"),
+        output_field=CharField(),
+    )
+    rows = (
+        Product.objects.filter(visibility="live")
+        .exclude(financial_status="sold")
+        .order_by()
+        .annotate(price_band=price_band)
+        .values("brand_id", "category_id", "condition", "price_band")
+        .annotate(count=Count("id"))
+    )
+    FacetCount.objects.bulk_create([FacetCount(**row) for row in rows])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tackle", "0008_alter_productimage_image"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="FacetCount",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("condition", models.CharField(max_length=100)),
+                ("price_band", models.CharField(max_length=20)),
+                ("count", models.PositiveIntegerField(default=0)),
+                (
+                    "brand",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE, to="tackle.brand"
+                    ),
+                ),
+                (
+                    "category",
+                    models.ForeignKey(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        to="tackle.category",
+                    ),
+                ),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name="facetcount",
+            constraint=models.UniqueConstraint(
+                fields=("brand", "category", "condition", "price_band"),
+                name="unique_facet_count",
+            ),
+        ),
+        migrations.RunPython(populate_facet_counts, migrations.RunPython.noop),
+    ]
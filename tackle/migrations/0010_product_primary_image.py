@@ -0,0 +1,34 @@
+# Generated by Django 4.2.5 on 2026-10-18 12:05
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+import django.db.models.deletion
+
+
+def backfill_primary_image(apps, schema_editor):
+    Product = apps.get_model("tackle", "Product")
+    ProductImage = apps.get_model("tackle", "ProductImage")
+    first_image = ProductImage.objects.filter(product=OuterRef("pk")).order_by("id")
+    Product.objects.update(primary_image=Subquery(first_image.values("id")[:1]))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("tackle", "0009_facetcount"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="product",
+            name="primary_image",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="+",
+                to="tackle.productimage",
+            ),
+        ),
+        migrations.RunPython(backfill_primary_image, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,60 @@
+# Generated by Django 4.2.5 on 2026-10-18 11:34
+
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    # Build the indexes without locking the product table against writes
+    atomic = False
+
+    dependencies = [
+        ("tackle", "0010_product_primary_image"),
+    ]
+
+    operations = [
+        AddIndexConcurrently(
+            model_name="product",
+            index=models.Index(
+                condition=models.Q(
+                    ("visibility", "live"),
+                    models.Q(("financial_status", "sold"), _negated=True),
+                ),
+                fields=["-created_at", "-id"],
+                name="product_live_recent_idx",
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="product",
+            index=models.Index(
+                condition=models.Q(
+                    ("visibility", "live"),
+                    models.Q(("financial_status", "sold"), _negated=True),
+                ),
+                fields=["price"],
+                name="product_live_price_idx",
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="product",
+            index=models.Index(
+                condition=models.Q(
+                    ("visibility", "live"),
+                    models.Q(("financial_status", "sold"), _negated=True),
+                ),
+                fields=["brand", "-created_at", "-id"],
+                name="product_live_brand_idx",
+            ),
+        ),
+        AddIndexConcurrently(
+            model_name="product",
+            index=models.Index(
+                condition=models.Q(
+                    ("visibility", "live"),
+                    models.Q(("financial_status", "sold"), _negated=True),
+                ),
+                fields=["category", "-created_at", "-id"],
+                name="product_live_category_idx",
+            ),
+        ),
+    ]
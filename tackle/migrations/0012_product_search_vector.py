@@ -0,0 +1,60 @@
+# Generated by Django 4.2.5 on 2026-10-18 12:40
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.contrib.postgres.operations import AddIndexConcurrently
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def backfill_search_vector(apps, schema_editor):
+    Product = apps.get_model("tackle", "Product")
+    vector = (
+        SearchVector("name", "brand__name", weight="A", config="english")
+        + SearchVector(
+            "category__name",
+            "variation1",
+            "variation2",
+            weight="B",
+            config="english",
+        )
+        + SearchVector("description", weight="C", config="english")
+    )
+    vectors = (
+        Product.objects.filter(pk=OuterRef("pk"))
+        .annotate(vector=vector)
+        .values("vector")
+    )
+    Product.objects.update(search_vector=Subquery(vectors[:1]))
+
+
+class Migration(migrations.Migration):
+    # Build the index without locking the product table against writes
+    atomic = False
+
+    dependencies = [
+        ("tackle", "0011_product_catalog_indexes"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="product",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(
+                editable=False, null=True
+            ),
+        ),
+        migrations.RunPython(backfill_search_vector, migrations.RunPython.noop),
+        AddIndexConcurrently(
+            model_name="product",
+            index=django.contrib.postgres.indexes.GinIndex(
+                condition=models.Q(
+                    ("visibility", "live"),
+                    models.Q(("financial_status", "sold"), _negated=True),
+                ),
+                fields=["search_vector"],
+                name="product_live_search_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,43 @@
+# Generated by Django 4.2.5 on 2026-10-18 11:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("tackle", "0013_brand_category_name_trgm"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="productimage",
+            name="pending_file",
+            field=models.CharField(blank=True, max_length=255),
+        ),
+        migrations.AddField(
+            model_name="productimage",
+            name="status",
+            field=models.CharField(
+                choices=[
+                    ("pending", "Pending"),
+                    ("ready", "Ready"),
+                    ("failed", "Failed"),
+                ],
+                default="ready",
+                max_length=10,
+            ),
+        ),
+        migrations.AlterField(
+            model_name="productimage",
+            name="image",
+            field=models.ImageField(blank=True, upload_to="product-images/2023/10/"),
+        ),
+        migrations.AddIndex(
+            model_name="productimage",
+            index=models.Index(
+                condition=models.Q(("status", "pending")),
+                fields=["id"],
+                name="productimage_pending_idx",
+            ),
+        ),
+    ]
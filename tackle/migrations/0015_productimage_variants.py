@@ -0,0 +1,17 @@
+# Generated by Django 4.2.5 on 2026-10-18 12:30
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("tackle", "0014_productimage_status"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="productimage",
+            name="variants",
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
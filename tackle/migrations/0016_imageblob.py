@@ -0,0 +1,38 @@
+# Generated by Django 4.2.5 on 2026-10-18 13:10
+
+from django.db import migrations, models
+import tackle.models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("tackle", "0015_productimage_variants"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ImageBlob",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("name", models.CharField(max_length=255, unique=True)),
+                ("size", models.PositiveIntegerField()),
+                ("refcount", models.PositiveIntegerField(default=0)),
+                ("created_at", models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AlterField(
+            model_name="productimage",
+            name="image",
+            field=models.ImageField(
+                blank=True, upload_to=tackle.models.product_image_path
+            ),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 4.2.5 on 2026-10-18 14:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("tackle", "0016_imageblob"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="productimage",
+            name="dominant_colour",
+            field=models.CharField(blank=True, max_length=7),
+        ),
+        migrations.AddField(
+            model_name="productimage",
+            name="height",
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="productimage",
+            name="size",
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="productimage",
+            name="width",
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
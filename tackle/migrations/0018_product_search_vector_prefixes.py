@@ -0,0 +1,39 @@
+# Generated by Django 4.2.5 on 2026-10-18 16:05
+
+from django.contrib.postgres.search import SearchVector
+from django.db import migrations
+from django.db.models import OuterRef, Subquery
+
+
+def weighted_vector(config):
+    return (
+        SearchVector("name", "brand__name", weight="A", config=config)
+        + SearchVector(
+            "category__name",
+            "variation1",
+            "variation2",
+            weight="B",
+            config=config,
+        )
+        + SearchVector("description", weight="C", config=config)
+    )
+
+
+def refresh_search_vector(apps, schema_editor):
+    Product = apps.get_model("tackle", "Product")
+    vectors = (
+        Product.objects.filter(pk=OuterRef("pk"))
+        .annotate(vector=weighted_vector("english") + weighted_vector("simple"))
+        .values("vector")
+    )
+    Product.objects.update(search_vector=Subquery(vectors[:1]))
+
+
+class Migration(migrations.Migration):
+    dependencies = [
+        ("tackle", "0017_productimage_metadata"),
+    ]
+
+    operations = [
+        migrations.RunPython(refresh_search_vector, migrations.RunPython.noop),
+    ]
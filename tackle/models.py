@@ -1,11 +1,18 @@
 # Python standard library imports
+import hashlib
 from datetime import datetime
 from decimal import Decimal
 
 # Django core imports
 from django.conf import settings
+from django.contrib.postgres.indexes import GinIndex, OpClass
+from django.contrib.postgres.search import SearchVectorField
 from django.contrib.auth.models import User
-from django.db import models
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import IntegrityError, models, transaction
+from django.db.models.functions import Upper
+from django.templatetags.static import static
 from django.utils.text import slugify
 
 # App-specific imports
@@ -20,6 +27,15 @@ class Brand(models.Model):
 
     class Meta:
         db_table = "tackle_brand"
+        indexes = [
+            # On UPPER(name), not name: it serves lookups that compare
+            # UPPER(name), namely iexact, istartswith and icontains, and the
+            # trigram filters suggest_names runs on Upper('name')
+            GinIndex(
+                OpClass(Upper('name'), name='gin_trgm_ops'),
+                name='brand_name_trgm_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.name
@@ -33,6 +49,15 @@ class Category(models.Model):
 
     class Meta:
         db_table = "tackle_category"
+        indexes = [
+            # On UPPER(name), not name: it serves lookups that compare
+            # UPPER(name), namely iexact, istartswith and icontains, and the
+            # trigram filters suggest_names runs on Upper('name')
+            GinIndex(
+                OpClass(Upper('name'), name='gin_trgm_ops'),
+                name='category_name_trgm_idx',
+            ),
+        ]
 
     def __str__(self):
         return self.name
@@ -68,6 +93,26 @@ class ProductVisibility(models.TextChoices):
     LIVE = 'live', 'Live'
 
 
+# Predicate for the public catalog. The partial indexes on Product use the
+# same expression so the planner can match them to catalog queries.
+LIVE_PRODUCTS = (
+    models.Q(visibility=ProductVisibility.LIVE) &
+    ~models.Q(financial_status=FinancialStatus.SOLD)
+)
+
+
+class ProductQuerySet(models.QuerySet):
+    """
+    Custom queryset for products. Holds the filters shared by the public
+    catalog pages so they all hit the database the same way.
+    """
+    def live(self):
+        """
+        Products that are published and have not been sold.
+        """
+        return self.filter(LIVE_PRODUCTS)
+
+
 class Product(models.Model):
     """
     Represents a product in the database. Stores details like brand, category,
@@ -101,6 +146,59 @@ class Product(models.Model):
         choices=ProductVisibility.choices,
         default=ProductVisibility.DRAFT
     )
+    primary_image = models.ForeignKey(
+        'ProductImage', null=True, blank=True, on_delete=models.SET_NULL,
+        related_name='+'
+    )
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    objects = ProductQuerySet.as_manager()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['-created_at', '-id'],
+                name='product_live_recent_idx',
+                condition=LIVE_PRODUCTS,
+            ),
+            models.Index(
+                fields=['price'],
+                name='product_live_price_idx',
+                condition=LIVE_PRODUCTS,
+            ),
+            models.Index(
+                fields=['brand', '-created_at', '-id'],
+                name='product_live_brand_idx',
+                condition=LIVE_PRODUCTS,
+            ),
+            models.Index(
+                fields=['category', '-created_at', '-id'],
+                name='product_live_category_idx',
+                condition=LIVE_PRODUCTS,
+            ),
+            GinIndex(
+                fields=['search_vector'],
+                name='product_live_search_idx',
+                condition=LIVE_PRODUCTS,
+            ),
+        ]
+
+    # Fields that decide which FacetCount row a product is counted in
+    FACET_STATE_FIELDS = (
+        'brand_id', 'category_id', 'condition', 'price',
+        'visibility', 'financial_status',
+    )
+    _stored_facet_state = None
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        if all(field in field_names for field in cls.FACET_STATE_FIELDS):
+            instance._stored_facet_state = instance.facet_state()
+        return instance
+
+    def facet_state(self):
+        return tuple(getattr(self, field) for field in self.FACET_STATE_FIELDS)
 
     def is_in_stock(self):
         return self.financial_status == FinancialStatus.UNSOLD
@@ -129,23 +227,283 @@ class Product(models.Model):
     def total_with_shipping(self):
         return self.price + self.shipping
 
+    def refresh_primary_image(self, save=True):
+        """
+        Point primary_image at the first image the product still has, so
+        listing pages can show the thumbnail without querying images.
+        """
+        self.primary_image = self.images.order_by('id').first()
+        if save:
+            self.save(update_fields=['primary_image'])
+
+
+class FacetCountManager(models.Manager):
+    """
+    Manager for FacetCount with an atomic counter update.
+    """
+    def adjust(self, key, delta):
+        """
+        Add delta to the row for a (brand_id, category_id, condition,
+        price_band) key, creating it if needed. Never goes below zero.
+        """
+        if key is None:
+            return
+        brand_id, category_id, condition, price_band = key
+        lookup = {
+            'brand_id': brand_id,
+            'category_id': category_id,
+            'condition': condition,
+            'price_band': price_band,
+        }
+        rows = self.filter(**lookup)
+        if delta < 0:
+            rows = rows.filter(count__gte=-delta)
+        if rows.update(count=models.F('count') + delta) or delta < 0:
+            return
+        try:
+            with transaction.atomic():
+                self.create(count=delta, **lookup)
+        except IntegrityError:
+            self.filter(**lookup).update(count=models.F('count') + delta)
+
+
+class FacetCount(models.Model):
+    """
+    Rollup of live, unsold product counts per brand, category, condition
+    and price band, so the shop facets can be read without scanning
+    products. Kept up to date by the receivers in tackle.signals and
+    rebuilt with the rebuild_facet_counts management command.
+    """
+    brand = models.ForeignKey(Brand, on_delete=models.CASCADE)
+    category = models.ForeignKey(Category, on_delete=models.CASCADE)
+    condition = models.CharField(max_length=100)
+    price_band = models.CharField(max_length=20)
+    count = models.PositiveIntegerField(default=0)
+
+    objects = FacetCountManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['brand', 'category', 'condition', 'price_band'],
+                name='unique_facet_count',
+            ),
+        ]
+
+    def __str__(self):
+        return (
+            f"{self.brand_id}/{self.category_id}/{self.condition}/"
+            f"{self.price_band}: {self.count}"
+        )
+
+
+def product_image_path(instance, filename):
+    """
+    Dated folder for files saved straight onto ProductImage.image, worked
+    out at save time rather than once when the module is imported.
+    """
+    return f"product-images/{datetime.now().strftime('%Y/%m/')}{filename}"
+
+
+class ImageStatus(models.TextChoices):
+    """
+    Enum for product image processing, from upload to stored.
+    """
+    PENDING = 'pending', 'Pending'
+    READY = 'ready', 'Ready'
+    FAILED = 'failed', 'Failed'
+
 
 class ProductImage(models.Model):
     """
     Represents an image of a product.
-    Links to the Product model and stores the image.
+    Links to the Product model and stores the image. New uploads wait in
+    local storage as `pending_file` until the image worker has processed
+    them into `image`.
     """
+    PLACEHOLDER = 'media/image-processing.svg'
+
     product = models.ForeignKey(
         Product, related_name="images", on_delete=models.CASCADE
     )
     image = models.ImageField(
-        upload_to=f"product-images/{datetime.now().strftime('%Y/%m/')}"
+        upload_to=product_image_path, blank=True
+    )
+    status = models.CharField(
+        max_length=10,
+        choices=ImageStatus.choices,
+        default=ImageStatus.READY
     )
+    pending_file = models.CharField(max_length=255, blank=True)
+    # Responsive copies in storage: {extension: {width: name}}
+    variants = models.JSONField(default=dict, blank=True)
+    # Recorded when processed so pages never read the file for them
+    width = models.PositiveIntegerField(null=True, blank=True)
+    height = models.PositiveIntegerField(null=True, blank=True)
+    size = models.PositiveIntegerField(null=True, blank=True)
+    dominant_colour = models.CharField(max_length=7, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['id'],
+                name='productimage_pending_idx',
+                condition=models.Q(status=ImageStatus.PENDING),
+            ),
+        ]
+
+    @property
+    def url(self):
+        """
+        The stored image, or a placeholder until it has been processed.
+        """
+        if self.status == ImageStatus.READY and self.image:
+            return self.image.url
+        return static(self.PLACEHOLDER)
+
+    def srcset(self, extension):
+        """
+        The srcset for one variant format, narrowest first, or an empty
+        string if the image has none.
+        """
+        if self.status != ImageStatus.READY:
+            return ''
+        widths = self.variants.get(extension, {})
+        return ', '.join(
+            f"{self.image.storage.url(widths[width])} {width}w"
+            for width in sorted(widths, key=int)
+        )
+
+    def blob_names(self):
+        """
+        Every stored file this image refers to: the image and its variants.
+        """
+        names = {
+            name for widths in self.variants.values()
+            for name in widths.values()
+        }
+        if self.image:
+            names.add(self.image.name)
+        return names
+
+    def rename_blobs(self, renamed):
+        """
+        Swap blob names for the ones they were stored under, given as
+        {requested name: stored name}, without saving the row.
+        """
+        if self.image:
+            self.image.name = renamed.get(self.image.name, self.image.name)
+        self.variants = {
+            extension: {
+                width: renamed.get(name, name)
+                for width, name in widths.items()
+            }
+            for extension, widths in self.variants.items()
+        }
 
     def __str__(self):
         return str(self.id)
 
 
+class ImageBlobManager(models.Manager):
+    """
+    Manager for ImageBlob with atomic reference counting.
+    """
+    def acquire(self, buffer, extension):
+        """
+        Take a reference to the blob holding the bytes in `buffer`. Returns
+        (name, created); a created blob still has to be put in storage with
+        store(). Names are the SHA-256 of the bytes, so identical files
+        share one blob.
+        """
+        digest = hashlib.sha256(buffer.getbuffer()).hexdigest()
+        name = (
+            f"{ImageBlob.PREFIX}{digest[:2]}/{digest[2:4]}/"
+            f"{digest}.{extension}"
+        )
+        rows = self.filter(name=name)
+        if rows.update(refcount=models.F('refcount') + 1):
+            return name, False
+        try:
+            with transaction.atomic():
+                self.create(
+                    name=name, size=buffer.getbuffer().nbytes, refcount=1
+                )
+        except IntegrityError:
+            rows.update(refcount=models.F('refcount') + 1)
+            return name, False
+        return name, True
+
+    def store(self, name, buffer):
+        """
+        Upload a blob's bytes unless storage already has them. Returns the
+        name they are stored under, which storage may have changed if
+        another file took `name` in the meantime; rename() records it.
+        Needs no database, so uploads can run on worker threads.
+        """
+        if default_storage.exists(name):
+            return name
+        buffer.seek(0)
+        return default_storage.save(
+            name, File(buffer),
+            max_length=ProductImage._meta.get_field('image').max_length
+        )
+
+    def rename(self, renamed):
+        """
+        Point blobs at the names store() actually saved them under, given
+        as {requested name: stored name}.
+        """
+        for name, stored_name in renamed.items():
+            self.filter(name=name).update(name=stored_name)
+
+    def release(self, names):
+        """
+        Drop a reference to each blob in `names`. Blobs left unreferenced
+        are deleted once the transaction commits. Names from before blobs
+        existed have no row and are left alone.
+        """
+        names = set(names)
+        self.filter(name__in=names, refcount__gt=0).update(
+            refcount=models.F('refcount') - 1
+        )
+        transaction.on_commit(lambda: self.delete_unreferenced(names))
+
+    def delete_unreferenced(self, names=None):
+        """
+        Delete unreferenced blobs from storage, only those in `names` if
+        given. Blobs another transaction is re-acquiring are skipped.
+        """
+        with transaction.atomic():
+            blobs = self.select_for_update(skip_locked=True).filter(
+                refcount=0
+            )
+            if names is not None:
+                blobs = blobs.filter(name__in=names)
+            for blob in blobs:
+                default_storage.delete(blob.name)
+                blob.delete()
+
+
+class ImageBlob(models.Model):
+    """
+    A processed image file in storage, named by the hash of its bytes and
+    shared by every ProductImage that uses the same bytes. `refcount` is
+    how many image or variant entries point at it.
+    """
+    PREFIX = 'product-images/blobs/'
+
+    name = models.CharField(max_length=255, unique=True)
+    size = models.PositiveIntegerField()
+    refcount = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    objects = ImageBlobManager()
+
+    def __str__(self):
+        return self.name
+
+
 class WebhookLog(models.Model):
     """
     Represents an image of a product.
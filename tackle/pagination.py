@@ -0,0 +1,106 @@
+# Python standard library imports
+import base64
+import json
+from datetime import datetime
+
+# Django core imports
+from django.db.models import Q
+
+
+class InvalidCursor(Exception):
+    """
+    Raised when a continuation token cannot be decoded.
+    """
+
+
+def encode_cursor(created_at, pk):
+    """
+    Build an opaque continuation token from the sort key of the last row
+    on a page.
+    """
+    payload = json.dumps([created_at.isoformat(), pk], separators=(',', ':'))
+    token = base64.urlsafe_b64encode(payload.encode('utf-8'))
+    return token.decode('ascii').rstrip('=')
+
+
+def decode_cursor(token):
+    """
+    Turn a continuation token back into a (created_at, pk) pair.
+    """
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        payload = base64.urlsafe_b64decode(padded.encode('ascii'))
+        created_at, pk = json.loads(payload)
+        return datetime.fromisoformat(created_at), int(pk)
+    except (ValueError, TypeError, UnicodeError):
+        raise InvalidCursor(token)
+
+
+class KeysetPage:
+    """
+    A single page of results from KeysetPaginator.
+    """
+    def __init__(self, object_list, next_cursor):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+
+class KeysetPaginator:
+    """
+    Paginates a product queryset newest first on (created_at, id).
+
+    Each page is fetched with a WHERE clause on the last seen sort key
+    instead of an OFFSET, so page 100 costs the same as page 1.
+    """
+    ordering = ('-created_at', '-id')
+
+    def __init__(self, queryset, per_page):
+        self.queryset = queryset
+        self.per_page = per_page
+
+    def get_queryset(self, cursor=None):
+        """
+        The ordered queryset for the page after `cursor`, with one extra
+        row to tell whether there is a next page.
+        """
+        queryset = self.queryset.order_by(*self.ordering)
+        if cursor:
+            created_at, pk = decode_cursor(cursor)
+            queryset = queryset.filter(
+                Q(created_at__lt=created_at) |
+                Q(created_at=created_at, id__lt=pk)
+            )
+        return queryset[:self.per_page + 1]
+
+    def page(self, cursor=None):
+        """
+        Return the page after `cursor`, or the first page when no cursor is
+        given. Raises InvalidCursor for tokens that cannot be decoded.
+        """
+        rows = list(self.get_queryset(cursor))
+        next_cursor = None
+        if len(rows) > self.per_page:
+            rows = rows[:self.per_page]
+            last = rows[-1]
+            next_cursor = encode_cursor(last.created_at, last.pk)
+
+        return KeysetPage(rows, next_cursor)
+
+    def get_page(self, cursor=None):
+        """
+        Like page(), but falls back to the first page for a bad cursor.
+        """
+        try:
+            return self.page(cursor)
+        except InvalidCursor:
+            return self.page()
@@ -0,0 +1,157 @@
+# Python standard library imports
+import operator
+import re
+from functools import reduce
+
+# Django core imports
+from django.conf import settings
+from django.contrib.postgres.search import (
+    SearchQuery, SearchRank, SearchVector, TrigramWordSimilarity
+)
+from django.db.models import F, OuterRef, Q, Subquery
+from django.db.models.functions import Upper
+
+# App-specific imports
+from .cache import ResultCache, bump_version
+from .models import Product
+
+
+# Whole words are matched on their English stems ("reels" finds "reel"),
+# and on the unstemmed words through PREFIX_CONFIG, so a partly typed
+# word still finds the words it starts ("fishin" finds "fishing").
+SEARCH_CONFIG = 'english'
+PREFIX_CONFIG = 'simple'
+
+# Product fields that feed the search vector. Saving any of them, or
+# renaming a brand or category, refreshes the stored vector.
+SEARCH_FIELDS = (
+    'name', 'brand', 'category', 'variation1', 'variation2', 'description',
+)
+
+MAX_QUERY_TERMS = 8
+
+SEARCH_VERSION_KEY = 'search:version'
+
+# Results for the header search box, shared by every request this worker
+# serves. Invalidated through SEARCH_VERSION_KEY when the live catalog
+# changes.
+search_cache = ResultCache(
+    settings.SEARCH_CACHE_SIZE, settings.SEARCH_CACHE_TTL,
+    version_key=SEARCH_VERSION_KEY
+)
+
+
+def weighted_vector(config):
+    """
+    Weighted tsvector over a product under one text search config: name
+    and brand rank highest, then category and variations, then the
+    description.
+    """
+    return (
+        SearchVector('name', 'brand__name', weight='A', config=config) +
+        SearchVector(
+            'category__name', 'variation1', 'variation2',
+            weight='B', config=config
+        ) +
+        SearchVector('description', weight='C', config=config)
+    )
+
+
+def product_search_vector():
+    """
+    The stored search vector: the stemmed words and the words as written.
+    """
+    return weighted_vector(SEARCH_CONFIG) + weighted_vector(PREFIX_CONFIG)
+
+
+def refresh_search_vectors(products):
+    """
+    Recompute the stored search vector for every product in a queryset
+    with a single UPDATE.
+    """
+    vectors = Product.objects.filter(pk=OuterRef('pk')).annotate(
+        vector=product_search_vector()
+    ).values('vector')
+    return products.update(search_vector=Subquery(vectors[:1]))
+
+
+def query_terms(text):
+    """
+    The lower-cased words of `text` that a search uses.
+    """
+    return re.findall(r'\w+', text.lower())[:MAX_QUERY_TERMS]
+
+
+def prefix_query(text):
+    """
+    Build a tsquery that matches every word of `text` as a prefix, so
+    partial input from the live search dropdown still hits. Each word
+    matches either through its stem or as written.
+    Returns None when the text has no searchable words.
+    """
+    terms = query_terms(text)
+    if not terms:
+        return None
+    return reduce(operator.and_, (
+        SearchQuery(f"{term}:*", search_type='raw', config=SEARCH_CONFIG) |
+        SearchQuery(f"{term}:*", search_type='raw', config=PREFIX_CONFIG)
+        for term in terms
+    ))
+
+
+def search_products(text, queryset=None):
+    """
+    Live products matching `text`, best matches first.
+    """
+    query = prefix_query(text)
+    if query is None:
+        return Product.objects.none()
+    if queryset is None:
+        queryset = Product.objects.live()
+    return queryset.filter(search_vector=query).annotate(
+        rank=SearchRank(F('search_vector'), query)
+    ).order_by('-rank', '-created_at', '-id')
+
+
+def search_suggestions(text, limit=5):
+    """
+    Name and slug of the top live matches for the header search box,
+    served from search_cache. "Reel", " reel " and "REEL" share one entry.
+    """
+    key = ' '.join(query_terms(text))
+    if not key:
+        return []
+    return search_cache.get_or_compute(
+        (key, limit),
+        lambda: list(search_products(key).values('name', 'slug')[:limit])
+    )
+
+
+def invalidate_search_cache():
+    """
+    Clear the cached search results in every worker.
+    """
+    bump_version(SEARCH_VERSION_KEY)
+
+
+def suggest_names(model, term, limit=None):
+    """
+    Brand or category names for the list product autocomplete. Matches
+    substrings and near misses ("shimno" finds "Shimano") through the
+    trigram index on the upper-cased name, most similar first, capped at
+    `limit`.
+    """
+    term = term.strip()
+    if not term:
+        return []
+    if limit is None:
+        limit = settings.AUTOCOMPLETE_LIMIT
+    # Every condition goes through UPPER(name) to match the index
+    names = model.objects.annotate(upper_name=Upper('name')).filter(
+        Q(upper_name__contains=term.upper()) |
+        Q(upper_name__trigram_similar=term) |
+        Q(upper_name__trigram_word_similar=term)
+    ).annotate(
+        similarity=TrigramWordSimilarity(term, 'name')
+    ).order_by('-similarity', 'name').values_list('name', flat=True)
+    return list(names[:limit])
@@ -0,0 +1,171 @@
+"""
+Cache-backed sessions with write-behind to the database.
+"""
+# Python standard library imports
+import atexit
+import logging
+import threading
+import time
+
+# Django core imports
+from django.conf import settings
+from django.contrib.sessions.backends.db import SessionStore as DBStore
+from django.contrib.sessions.models import Session
+from django.core.cache import caches
+from django.db import close_old_connections, connection
+
+logger = logging.getLogger(__name__)
+
+KEY_PREFIX = "tackle.sessions"
+
+
+class WriteBehindQueue:
+    """
+    Session rows waiting to be written to the database. Several saves of
+    one session before a flush become a single write. Flushes only update
+    rows that already exist, so a session deleted meanwhile, by logging
+    out for example, is never written back.
+    """
+    def __init__(self, interval):
+        self.interval = interval
+        self.pending = {}
+        self.lock = threading.Lock()
+        self.thread = None
+
+    def put(self, session_key, session_data, expire_date):
+        """
+        Queue the latest state of a session, starting the writer thread
+        the first time.
+        """
+        with self.lock:
+            self.pending[session_key] = (session_data, expire_date)
+            if self.thread is None:
+                self.thread = threading.Thread(
+                    target=self.run, name='session-write-behind', daemon=True
+                )
+                self.thread.start()
+
+    def discard(self, session_key):
+        with self.lock:
+            self.pending.pop(session_key, None)
+
+    def flush(self):
+        """
+        Write every waiting session that still has a row. Returns how many
+        were written.
+        """
+        with self.lock:
+            pending, self.pending = self.pending, {}
+        written = 0
+        for session_key, (session_data, expire_date) in pending.items():
+            written += Session.objects.filter(session_key=session_key).update(
+                session_data=session_data, expire_date=expire_date
+            )
+        return written
+
+    def run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Could not write sessions to the database")
+            finally:
+                close_old_connections()
+
+
+write_behind = WriteBehindQueue(settings.SESSION_WRITE_BEHIND_INTERVAL)
+atexit.register(write_behind.flush)
+
+
+class SessionStore(DBStore):
+    """
+    Sessions read from and saved to the shared cache, with the database
+    kept up to date behind it as the durable copy. A save whose data is
+    unchanged since it was loaded writes nothing at all.
+    """
+    cache_key_prefix = KEY_PREFIX
+
+    def __init__(self, session_key=None):
+        self._cache = caches[settings.SESSION_CACHE_ALIAS]
+        self._payload = None
+        super().__init__(session_key)
+
+    @property
+    def cache_key(self):
+        return self.cache_key_prefix + self._get_or_create_session_key()
+
+    def load(self):
+        """
+        Load the session from the cache, falling back to the database.
+        The serialized payload is kept to tell whether a save changes it.
+        """
+        try:
+            payload = self._cache.get(self.cache_key)
+        except Exception:
+            # Some backends raise on invalid keys; treat as a new session
+            payload = None
+
+        if payload is None:
+            row = self._get_session_from_db()
+            if not row:
+                return {}
+            data = self.decode(row.session_data)
+            payload = self.serializer().dumps(data)
+            self._cache.set(
+                self.cache_key, payload,
+                self.get_expiry_age(expiry=row.expire_date)
+            )
+            self._payload = payload
+            return data
+
+        self._payload = payload
+        return self.serializer().loads(payload)
+
+    def exists(self, session_key):
+        return (
+            session_key
+            and (self.cache_key_prefix + session_key) in self._cache
+            or super().exists(session_key)
+        )
+
+    def save(self, must_create=False):
+        """
+        Save new sessions to the database straight away, so their key is
+        known to be unique. Later saves go to the cache and are queued for
+        the database, or written now when inside a transaction so they
+        commit or roll back with it.
+        """
+        if self.session_key is None:
+            return self.create()
+        data = self._get_session(no_load=must_create)
+        payload = self.serializer().dumps(data)
+        if not must_create and payload == self._payload:
+            return
+        if must_create or connection.in_atomic_block:
+            super().save(must_create)
+        else:
+            write_behind.put(
+                self.session_key, self.encode(data), self.get_expiry_date()
+            )
+        self._cache.set(self.cache_key, payload, self.get_expiry_age())
+        self._payload = payload
+
+    def delete(self, session_key=None):
+        if session_key is None:
+            if self.session_key is None:
+                return
+            session_key = self.session_key
+        write_behind.discard(session_key)
+        super().delete(session_key)
+        self._cache.delete(self.cache_key_prefix + session_key)
+
+    def flush(self):
+        """
+        Remove the current session data from the database and regenerate
+        the key.
+        """
+        self.clear()
+        self.delete(self.session_key)
+        self._session_key = None
+        self._payload = None
@@ -0,0 +1,150 @@
+# Django core imports
+from django.contrib.auth.signals import user_logged_in
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+# App-specific imports
+from .autocomplete import bump_autocomplete_version
+from .cart import merge_cookie_cart
+from .facets import facet_key
+from .image_queue import discard_pending_file
+from .models import (
+    Brand, Category, FacetCount, ImageBlob, Product, ProductImage
+)
+from .search import (
+    SEARCH_FIELDS, invalidate_search_cache, refresh_search_vectors
+)
+
+
+@receiver(pre_save, sender=Product)
+def load_facet_state(sender, instance, raw, **kwargs):
+    """
+    Products loaded with deferred facet fields have no stored state to
+    compare against, so read it from the database before it is overwritten.
+    """
+    if raw or instance._state.adding or instance._stored_facet_state:
+        return
+    stored = Product.objects.filter(pk=instance.pk).values_list(
+        *Product.FACET_STATE_FIELDS
+    ).first()
+    instance._stored_facet_state = stored
+
+
+@receiver(post_save, sender=Product)
+def invalidate_search_on_save(sender, instance, raw, **kwargs):
+    """
+    Clear cached search results when a product goes live, sells, or is
+    edited while live. Must run before the facet receiver below replaces
+    the stored state.
+    """
+    if raw:
+        return
+    was_live = facet_key(instance._stored_facet_state) is not None
+    is_live = facet_key(instance.facet_state()) is not None
+    if was_live or is_live:
+        invalidate_search_cache()
+        transaction.on_commit(invalidate_search_cache)
+
+
+@receiver(post_save, sender=Product)
+def update_facet_counts_on_save(sender, instance, raw, **kwargs):
+    """
+    Move the product between FacetCount rows when it is created, edited,
+    published or sold.
+    """
+    if raw:
+        return
+    old_key = facet_key(instance._stored_facet_state)
+    new_key = facet_key(instance.facet_state())
+    if old_key != new_key:
+        FacetCount.objects.adjust(old_key, -1)
+        FacetCount.objects.adjust(new_key, 1)
+    instance._stored_facet_state = instance.facet_state()
+
+
+@receiver(post_delete, sender=Product)
+def update_facet_counts_on_delete(sender, instance, **kwargs):
+    """
+    Remove a deleted product from its FacetCount row.
+    """
+    FacetCount.objects.adjust(facet_key(instance._stored_facet_state), -1)
+
+
+@receiver(post_delete, sender=Product)
+def invalidate_search_on_delete(sender, instance, **kwargs):
+    """
+    A deleted product must drop out of cached search results.
+    """
+    invalidate_search_cache()
+    transaction.on_commit(invalidate_search_cache)
+
+
+@receiver(post_save, sender=Product)
+def update_search_vector(sender, instance, raw, update_fields, **kwargs):
+    """
+    Keep the stored search vector current when searchable fields change.
+    """
+    if raw:
+        return
+    if update_fields and not set(update_fields) & set(SEARCH_FIELDS):
+        return
+    refresh_search_vectors(Product.objects.filter(pk=instance.pk))
+
+
+@receiver(post_save, sender=Brand)
+@receiver(post_save, sender=Category)
+def update_search_vectors_on_rename(sender, instance, created, raw, **kwargs):
+    """
+    A renamed brand or category changes the vectors of all its products.
+    """
+    if raw or created:
+        return
+    field = 'brand' if sender is Brand else 'category'
+    refresh_search_vectors(Product.objects.filter(**{field: instance}))
+    invalidate_search_cache()
+
+
+@receiver(post_save, sender=Brand)
+@receiver(post_save, sender=Category)
+@receiver(post_delete, sender=Brand)
+@receiver(post_delete, sender=Category)
+def invalidate_autocomplete(sender, **kwargs):
+    """
+    Drop the in-memory autocomplete indexes. Bumped straight away for this
+    request, and again on commit in case another worker rebuilt from the
+    uncommitted state in between.
+    """
+    bump_autocomplete_version()
+    transaction.on_commit(bump_autocomplete_version)
+
+
+@receiver(post_delete, sender=ProductImage)
+def discard_pending_upload(sender, instance, **kwargs):
+    """
+    Images deleted before the worker got to them leave no raw upload
+    behind.
+    """
+    if instance.pending_file:
+        transaction.on_commit(
+            lambda: discard_pending_file(instance.pending_file)
+        )
+
+
+@receiver(post_delete, sender=ProductImage)
+def release_image_blobs(sender, instance, **kwargs):
+    """
+    Drop the deleted image's references to its blobs, so files no other
+    image shares are removed from storage.
+    """
+    ImageBlob.objects.release(instance.blob_names())
+
+
+@receiver(user_logged_in)
+def keep_cart_on_login(sender, request, user, **kwargs):
+    """
+    Carry the cart an anonymous shopper built in the cookie over to the
+    session they have logged in to.
+    """
+    if request is not None:
+        merge_cookie_cart(request)
@@ -0,0 +1,53 @@
+# Python standard library imports
+from functools import lru_cache
+
+# Django core imports
+from django.conf import settings
+
+# Third-party imports
+from storages.backends.s3boto3 import S3Boto3Storage
+
+# App-specific imports
+from .models import ImageBlob
+
+
+class MediaStorage(S3Boto3Storage):
+    """
+    S3 media storage. Image blobs are named by their content and never
+    change, so browsers and CDNs may cache them for good.
+    """
+    def __init__(self, **settings_overrides):
+        super().__init__(**settings_overrides)
+        # Kept per instance, so storages with other settings never share
+        self._public_url = lru_cache(maxsize=settings.MEDIA_URL_CACHE_SIZE)(
+            super().url
+        )
+
+    def get_object_parameters(self, name):
+        params = super().get_object_parameters(name)
+        if name.startswith(ImageBlob.PREFIX):
+            params["CacheControl"] = "public, max-age=31536000, immutable"
+        return params
+
+    def url(self, name, parameters=None, expire=None, http_method=None):
+        """
+        Public URLs on AWS_S3_CUSTOM_DOMAIN are the same every time for a
+        name, so they are built once and remembered. Signed URLs and URLs
+        with parameters are built fresh.
+        """
+        signed = self.querystring_auth and self.cloudfront_signer
+        if (
+            not self.custom_domain or signed
+            or parameters or expire or http_method
+        ):
+            return super().url(name, parameters, expire, http_method)
+        return self._public_url(name)
+
+
+class PendingImageStorage(MediaStorage):
+    """
+    Raw product photos waiting for the image worker, kept private in the
+    media bucket under pending/ so the web and worker dynos share them.
+    """
+    location = "pending"
+    default_acl = "private"
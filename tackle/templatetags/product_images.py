@@ -0,0 +1,72 @@
+from django import template
+from django.utils.html import format_html
+
+from tackle.models import ImageStatus
+
+register = template.Library()
+
+# `sizes` for the common layouts: the 2-up/4-up product card grid and the
+# 50px thumbnails in the buying and selling tables
+CARD_SIZES = "(min-width: 768px) 25vw, 50vw"
+THUMBNAIL_SIZES = "50px"
+
+
+@register.simple_tag
+def product_picture(image, sizes=CARD_SIZES, alt='', css_class='',
+                    element_id=''):
+    """
+    Render a ProductImage as a <picture> offering its WebP variants, with
+    a JPEG srcset on the fallback <img>, so browsers fetch the smallest
+    file that fills `sizes`. Images without variants get a plain <img>.
+    Usage: {% product_picture image "50px" alt="..." css_class="..." %}
+    """
+    if not image:
+        return ''
+
+    img = format_html(
+        '<img src="{}"{}{} alt="{}" class="{}"{} loading="lazy">',
+        image.url,
+        srcset_attributes(image.srcset('jpeg'), sizes),
+        image_dimensions(image),
+        alt,
+        css_class,
+        format_html(' id="{}"', element_id) if element_id else '',
+    )
+    webp = image.srcset('webp')
+    if not webp:
+        return img
+    return format_html(
+        '<picture><source type="image/webp"{}>{}</picture>',
+        srcset_attributes(webp, sizes),
+        img,
+    )
+
+
+@register.simple_tag
+def product_thumbnail(image, alt='', css_class=''):
+    """
+    product_picture sized for the 50px table thumbnails.
+    """
+    return product_picture(image, THUMBNAIL_SIZES, alt, css_class)
+
+
+@register.simple_tag
+def image_dimensions(image):
+    """
+    width, height and a dominant colour background for an image's <img>,
+    so the browser reserves its space and fills it before the file
+    arrives. Empty for images without recorded dimensions.
+    Usage: <img src="{{ image.url }}"{% image_dimensions image %}>
+    """
+    if not image or image.status != ImageStatus.READY or not image.width:
+        return ''
+    return format_html(
+        ' width="{}" height="{}" style="background-color: {}"',
+        image.width, image.height, image.dominant_colour or 'transparent'
+    )
+
+
+def srcset_attributes(srcset, sizes):
+    if not srcset:
+        return ''
+    return format_html(' srcset="{}" sizes="{}"', srcset, sizes)
@@ -1,11 +1,64 @@
-from django.test import TestCase
+import json
+import os
+import shutil
+import tempfile
+import threading
+import time
+from datetime import datetime
+from decimal import Decimal
+from unittest import mock
+from io import BytesIO, StringIO
+from PIL import Image
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage, default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.contrib.sessions.models import Session
+from django.core.cache import cache
+from django.templatetags.static import static
+from django.test import RequestFactory, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from storages.backends.s3boto3 import S3Boto3Storage
 from django.urls import reverse
-from .models import Product, Category, Brand
+from .models import (
+    Product, Category, Brand, FacetCount, ImageBlob, ProductImage
+)
+from django.core.management import call_command
+from .autocomplete import PrefixIndex, autocomplete
+from .cache import ResultCache
+from .cart import Cart, CartChange
+from .context_processors import cart_processor
+from .facets import compute_facets
+from .image_queue import process_images_now
+from .images import (
+    compress_jpeg, encode_jpeg, process_image, process_stored_image
+)
+from .search import search_cache
+from .sessions import SessionStore, WriteBehindQueue
+from .storage import MediaStorage
+from .templatetags.product_images import product_picture
 from .forms import CheckoutForm, ContactSellerForm
-from .views import ProductPage, ProductDeleteView, SearchView, ShopView
+from .views import (
+    ProductPage, ProductDeleteView, SearchView, ShopView, HomeView,
+    ShopProductsView
+)
 from django.contrib.auth import get_user_model
+from auth_app.models import Order
 
 User = get_user_model()
+MEDIA_ROOT = tempfile.mkdtemp()
+PENDING_IMAGE_ROOT = os.path.join(MEDIA_ROOT, 'pending')
+
+
+def make_upload(name='photo.jpg', size=(40, 30), colour='red'):
+    """
+    Build an uploaded JPEG file for image tests.
+    """
+    buffer = BytesIO()
+    Image.new('RGB', size, colour).save(buffer, format='JPEG')
+    return SimpleUploadedFile(name, buffer.getvalue(), 'image/jpeg')
 
 
 class CategoryModelTest(TestCase):
@@ -57,9 +110,158 @@ class SearchViewTest(TestCase):
     Test class for the SearchView.
     Verifies the functionality of the search feature.
     """
-    def test_search_view(self):
-        response = self.client.get(reverse('search'), {'search_text': 'query'})
+    def setUp(self):
+        user = User.objects.create_user(
+            email='seller@example.com', password='password123'
+        )
+        self.shimano = Brand.objects.create(name="Shimano")
+        reels = Category.objects.create(name="Reels")
+        self.reel = Product.objects.create(
+            brand=self.shimano, category=reels, name="Stradic FL 2500",
+            condition="Good", user=user, visibility="live",
+            description="Smooth spinning reel"
+        )
+        self.rod = Product.objects.create(
+            brand=Brand.objects.create(name="Daiwa"), category=reels,
+            name="Ninja rod", condition="Good", user=user,
+            visibility="live", description="Pairs well with a Stradic"
+        )
+        Product.objects.create(
+            brand=self.shimano, category=reels, name="Stradic draft",
+            condition="Good", user=user
+        )
+
+    def search(self, text):
+        response = self.client.get(reverse('search'), {'search_text': text})
         self.assertEqual(response.status_code, 200)
+        return [product['slug'] for product in response.json()]
+
+    def test_search_view(self):
+        self.assertEqual(self.search('query'), [])
+
+    def test_prefix_match_ranked_by_field(self):
+        self.assertEqual(self.search('strad'), [self.reel.slug, self.rod.slug])
+
+    def test_matches_brand_name(self):
+        self.assertEqual(self.search('shiman'), [self.reel.slug])
+
+    def test_partial_word_matches_unstemmed(self):
+        self.assertEqual(self.search('spinnin'), [self.reel.slug])
+        self.assertEqual(self.search('smooth spinn'), [self.reel.slug])
+
+    def test_whole_word_matches_stem(self):
+        self.assertEqual(self.search('smoothly'), [self.reel.slug])
+
+    def test_vector_follows_edits(self):
+        self.shimano.name = "Penn"
+        self.shimano.save()
+        self.assertEqual(self.search('penn'), [self.reel.slug])
+
+        self.rod.name = "Ninja LT reel"
+        self.rod.save()
+        self.assertIn(self.rod.slug, self.search('ninja lt'))
+
+
+class SearchCacheTest(TestCase):
+    """
+    Test class for the search result cache.
+    Checks LRU and TTL expiry, single-flight misses, invalidation when the
+    live catalog changes and the staff stats view.
+    """
+    def setUp(self):
+        search_cache.clear()
+        self.user = User.objects.create_user(
+            email='seller@example.com', password='password123'
+        )
+        self.reel = Product.objects.create(
+            brand=Brand.objects.create(name="Shimano"),
+            category=Category.objects.create(name="Reels"),
+            name="Stradic reel", condition="Good", user=self.user,
+            visibility="live"
+        )
+
+    def search(self, text):
+        response = self.client.get(reverse('search'), {'search_text': text})
+        return [product['slug'] for product in response.json()]
+
+    def test_lru_eviction_and_ttl(self):
+        cache = ResultCache(maxsize=2, ttl=60)
+        for key in ('a', 'b', 'a', 'c'):
+            cache.get_or_compute(key, lambda: key)
+        self.assertEqual(cache.get_or_compute('b', lambda: 'new'), 'new')
+        self.assertEqual(cache.stats()['hits'], 1)
+
+        expired = ResultCache(maxsize=2, ttl=0)
+        expired.get_or_compute('a', lambda: 1)
+        self.assertEqual(expired.get_or_compute('a', lambda: 2), 2)
+
+    def test_concurrent_misses_compute_once(self):
+        cache = ResultCache(maxsize=10, ttl=60)
+        started, release = threading.Event(), threading.Event()
+        calls = []
+
+        def compute():
+            calls.append(1)
+            started.set()
+            release.wait(5)
+            return 'result'
+
+        results = []
+        threads = [
+            threading.Thread(
+                target=lambda: results.append(
+                    cache.get_or_compute('rod', compute)
+                )
+            )
+            for _ in range(4)
+        ]
+        threads[0].start()
+        started.wait(5)
+        for thread in threads[1:]:
+            thread.start()
+        while cache.stats()['coalesced'] < 3:
+            time.sleep(0.01)
+        release.set()
+        for thread in threads:
+            thread.join(5)
+
+        self.assertEqual(len(calls), 1)
+        self.assertEqual(results, ['result'] * 4)
+
+    def test_repeat_search_is_served_from_cache(self):
+        self.assertEqual(self.search('strad'), [self.reel.slug])
+        with self.assertNumQueries(0):
+            self.assertEqual(self.search(' STRAD '), [self.reel.slug])
+        stats = search_cache.stats()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 1))
+
+    def test_selling_or_deleting_invalidates(self):
+        self.assertEqual(self.search('strad'), [self.reel.slug])
+        self.reel.financial_status = 'sold'
+        self.reel.save()
+        self.assertEqual(self.search('strad'), [])
+
+        other = Product.objects.create(
+            brand=self.reel.brand, category=self.reel.category,
+            name="Stradic spare spool", condition="Good", user=self.user
+        )
+        self.assertEqual(self.search('strad'), [])
+        other.visibility = 'live'
+        other.save()
+        self.assertEqual(self.search('strad'), [other.slug])
+        other.delete()
+        self.assertEqual(self.search('strad'), [])
+
+    def test_stats_view_is_staff_only(self):
+        url = reverse('search_stats')
+        self.assertEqual(self.client.get(url).status_code, 302)
+        self.user.is_staff = True
+        self.user.save()
+        self.client.force_login(self.user)
+        self.assertEqual(
+            set(self.client.get(url).json()),
+            {'hits', 'misses', 'coalesced', 'size'}
+        )
 
 
 class ShopViewTest(TestCase):
@@ -69,3 +271,1300 @@ class ShopViewTest(TestCase):
     def test_shop_view(self):
         response = self.client.get(reverse('shop'))
         self.assertEqual(response.status_code, 200)
+
+
+class HomeViewPaginationTest(TestCase):
+    """
+    Test class for the HomeView keyset pagination.
+    Checks page size, continuation tokens and bad cursors.
+    """
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='seller@example.com', password='password123'
+        )
+        brand = Brand.objects.create(name="Shimano")
+        category = Category.objects.create(name="Reels")
+        self.products = [
+            Product.objects.create(
+                brand=brand, category=category, name=f"Reel {i}",
+                condition="Good", user=self.user, visibility="live"
+            )
+            for i in range(HomeView.paginate_by + 3)
+        ]
+
+    def test_first_page(self):
+        response = self.client.get(reverse('home'))
+        page = response.context['page']
+        self.assertEqual(len(page), HomeView.paginate_by)
+        self.assertTrue(page.has_next)
+        self.assertEqual(page.object_list[0], self.products[-1])
+
+    def test_next_page(self):
+        first = self.client.get(reverse('home')).context['page']
+        response = self.client.get(
+            reverse('home'), {'cursor': first.next_cursor}
+        )
+        page = response.context['page']
+        self.assertEqual(len(page), 3)
+        self.assertFalse(page.has_next)
+        self.assertEqual(page.object_list[-1], self.products[0])
+
+    def test_invalid_cursor_returns_first_page(self):
+        response = self.client.get(reverse('home'), {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.context['page']), HomeView.paginate_by)
+
+
+class ShopProductsViewTest(TestCase):
+    """
+    Test class for the ShopProductsView JSON feed.
+    Checks cursor paging and that shop filters are applied.
+    """
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='seller@example.com', password='password123'
+        )
+        self.shimano = Brand.objects.create(name="Shimano")
+        daiwa = Brand.objects.create(name="Daiwa")
+        category = Category.objects.create(name="Reels")
+        for i in range(ShopProductsView.paginate_by + 2):
+            Product.objects.create(
+                brand=self.shimano if i % 2 else daiwa, category=category,
+                name=f"Reel {i}", condition="Good", user=self.user,
+                visibility="live", price=10 + i
+            )
+
+    def test_pages_follow_cursor(self):
+        first = self.client.get(reverse('shop_products')).json()
+        self.assertEqual(len(first['results']), ShopProductsView.paginate_by)
+        self.assertEqual(first['results'][0]['seller'], self.user.username)
+
+        second = self.client.get(
+            reverse('shop_products'), {'cursor': first['next_cursor']}
+        ).json()
+        self.assertEqual(len(second['results']), 2)
+        self.assertIsNone(second['next_cursor'])
+
+    def test_filters_are_applied(self):
+        response = self.client.get(
+            reverse('shop_products'), {'brand': self.shimano.id, 'price': 20}
+        ).json()
+        self.assertEqual(len(response['results']), 5)
+
+    def test_invalid_cursor(self):
+        response = self.client.get(reverse('shop_products'), {'cursor': '!'})
+        self.assertEqual(response.status_code, 400)
+
+
+class FacetTest(TestCase):
+    """
+    Test class for the shop facet engine.
+    Checks bucket counts and that they come from a single query.
+    """
+    def setUp(self):
+        user = User.objects.create_user(
+            email='seller@example.com', password='password123'
+        )
+        self.shimano = Brand.objects.create(name="Shimano")
+        self.daiwa = Brand.objects.create(name="Daiwa")
+        self.reels = Category.objects.create(name="Reels")
+        rods = Category.objects.create(name="Rods")
+        for brand, category, condition, price in (
+            (self.shimano, self.reels, "Good", 20),
+            (self.shimano, rods, "Perfect", 60),
+            (self.shimano, self.reels, "Good", 300),
+            (self.daiwa, self.reels, "Fair", 30),
+        ):
+            Product.objects.create(
+                brand=brand, category=category, name="Item", user=user,
+                condition=condition, price=price, visibility="live"
+            )
+
+    def test_bucket_counts(self):
+        with self.assertNumQueries(1):
+            facets = compute_facets(Product.objects.live())
+        self.assertEqual(
+            [(b.label, b.count) for b in facets['brand']],
+            [("Daiwa", 1), ("Shimano", 3)]
+        )
+        self.assertEqual(
+            [(b.label, b.count) for b in facets['category']],
+            [("Reels", 3), ("Rods", 1)]
+        )
+        self.assertEqual(
+            [(b.value, b.count) for b in facets['condition']],
+            [("Perfect", 1), ("Good", 2), ("Fair", 1)]
+        )
+        self.assertEqual(
+            [(b.value, b.count) for b in facets['price_band']],
+            [("under-25", 1), ("25-50", 1), ("50-100", 1), ("250-plus", 1)]
+        )
+
+    def test_shop_view_filters_and_facets(self):
+        response = self.client.get(
+            reverse('shop'), {'category': self.reels.id, 'price_band': '25-50'}
+        )
+        self.assertEqual(len(response.context['products']), 1)
+        self.assertEqual(
+            [(b.label, b.count) for b in response.context['available_brands']],
+            [("Daiwa", 1)]
+        )
+
+
+class FacetCountRollupTest(TestCase):
+    """
+    Test class for the FacetCount rollup.
+    Checks it follows product state changes and matches a full rebuild.
+    """
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='seller@example.com', password='password123'
+        )
+        self.shimano = Brand.objects.create(name="Shimano")
+        self.daiwa = Brand.objects.create(name="Daiwa")
+        self.reels = Category.objects.create(name="Reels")
+
+    def create_product(self, **kwargs):
+        fields = {
+            'brand': self.shimano, 'category': self.reels, 'name': "Reel",
+            'condition': "Good", 'user': self.user, 'price': 40,
+            'visibility': "live",
+        }
+        fields.update(kwargs)
+        return Product.objects.create(**fields)
+
+    def counts(self):
+        return sorted(
+            FacetCount.objects.filter(count__gt=0).values_list(
+                'brand__name', 'condition', 'price_band', 'count'
+            )
+        )
+
+    def test_tracks_product_changes(self):
+        product = self.create_product()
+        self.create_product(visibility="draft")
+        self.assertEqual(self.counts(), [("Shimano", "Good", "25-50", 1)])
+
+        product = Product.objects.get(pk=product.pk)
+        product.brand = self.daiwa
+        product.price = "120.00"
+        product.save()
+        self.assertEqual(self.counts(), [("Daiwa", "Good", "100-250", 1)])
+
+        product.financial_status = "sold"
+        product.save()
+        self.assertEqual(self.counts(), [])
+
+    def test_publish_and_delete(self):
+        product = self.create_product(visibility="draft")
+        product.visibility = "live"
+        product.save()
+        self.assertEqual(self.counts(), [("Shimano", "Good", "25-50", 1)])
+
+        Product.objects.get(pk=product.pk).delete()
+        self.assertEqual(self.counts(), [])
+
+    def test_rebuild_matches_incremental(self):
+        for price in (10, 40, 40, 300):
+            self.create_product(price=price)
+        incremental = self.counts()
+        FacetCount.objects.all().delete()
+        call_command('rebuild_facet_counts', stdout=StringIO())
+        self.assertEqual(self.counts(), incremental)
+
+    def test_unfiltered_shop_reads_rollup(self):
+        self.create_product()
+        facets = compute_facets(Product.objects.live())
+        response = self.client.get(reverse('shop'))
+        self.assertEqual(
+            response.context['available_brands'], facets['brand']
+        )
+
+
+class CompressJpegTest(TestCase):
+    """
+    Test class for the JPEG quality search and process_image.
+    Checks it picks the same quality as the old 2-step loop in far fewer
+    encodes, and that the checked bytes are the ones handed to storage.
+    """
+    def setUp(self):
+        self.img = Image.effect_noise((400, 300), 40).convert('RGB')
+
+    def linear_quality(self, target):
+        quality = 100
+        while quality > 30:
+            if encode_jpeg(self.img, quality).tell() <= target:
+                break
+            quality -= 2
+        return quality
+
+    def test_matches_linear_search(self):
+        for target in (10 ** 6, 60000, 30000, 15000, 100):
+            buffer, quality, encodes = compress_jpeg(self.img, target)
+            self.assertEqual(quality, self.linear_quality(target))
+            self.assertLessEqual(encodes, 10)
+            if quality > 30:
+                self.assertLessEqual(buffer.tell(), target)
+
+    def test_fits_first_time(self):
+        _, quality, encodes = compress_jpeg(self.img, 10 ** 7)
+        self.assertEqual((quality, encodes), (100, 1))
+
+    def test_process_image_respects_target(self):
+        buffer = BytesIO()
+        self.img.resize((1200, 900)).save(buffer, format='PNG')
+        upload = SimpleUploadedFile('photo.png', buffer.getvalue())
+        processed = process_image(upload, target_filesize=200000)
+        self.assertLessEqual(processed.size, 200000)
+        self.assertEqual(len(processed.buffer.getvalue()), processed.size)
+        self.assertEqual(
+            (processed.width, processed.height, processed.format),
+            (894, 670, 'JPEG')
+        )
+        stored = processed.as_file('photo.png')
+        self.assertEqual(stored.name, 'photo.jpg')
+        self.assertEqual(stored.size, processed.size)
+        self.assertEqual(Image.open(stored).size, (894, 670))
+
+    def test_large_jpeg_decodes_at_reduced_scale(self):
+        upload = make_upload(size=(4000, 3000))
+        resized_from = []
+        resize = Image.Image.resize
+
+        def spy(img, *args, **kwargs):
+            resized_from.append(img.size)
+            return resize(img, *args, **kwargs)
+
+        with mock.patch.object(Image.Image, 'resize', spy):
+            processed = process_image(upload)
+        self.assertEqual(resized_from[0], (1000, 750))
+        self.assertEqual((processed.width, processed.height), (894, 670))
+
+
+@override_settings(
+    DEFAULT_FILE_STORAGE='django.core.files.storage.FileSystemStorage',
+    MEDIA_ROOT=MEDIA_ROOT,
+    PENDING_IMAGE_ROOT=PENDING_IMAGE_ROOT,
+)
+class PrimaryImageTest(TestCase):
+    """
+    Test class for the denormalised Product.primary_image thumbnail.
+    Checks it is maintained by the views and keeps card queries constant.
+    """
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='seller@example.com', password='password123'
+        )
+        self.client.login(email='seller@example.com', password='password123')
+        self.brand = Brand.objects.create(name="Shimano")
+        self.category = Category.objects.create(name="Reels")
+
+    def create_products(self, count):
+        for i in range(count):
+            product = Product.objects.create(
+                brand=self.brand, category=self.category, name="Reel",
+                condition="Good", user=self.user, visibility="live"
+            )
+            ProductImage.objects.create(product=product, image=make_upload())
+            product.refresh_primary_image()
+
+    def test_list_and_edit_maintain_primary_image(self):
+        self.client.post(reverse('list-product'), {
+            'brand': "Shimano", 'category': "Reels", 'name': "Reel",
+            'condition': "Good", 'price': 10, 'shipping': 2,
+            'images': [make_upload('a.jpg'), make_upload('b.jpg')],
+        })
+        product = Product.objects.get()
+        first, second = product.images.order_by('id')
+        self.assertEqual(product.primary_image, first)
+
+        self.client.post(reverse('edit_product', args=[product.id]), {
+            'brand': "Shimano", 'category': "Reels", 'name': "Reel",
+            'price': 10, 'shipping': 2, 'visibility': "live",
+            'delete_images': [first.id],
+        })
+        product.refresh_from_db()
+        self.assertEqual(product.primary_image, second)
+
+    def test_listing_queries_do_not_grow_with_cards(self):
+        self.create_products(2)
+        with CaptureQueriesContext(connection) as few:
+            self.client.get(reverse('home'))
+            self.client.get(reverse('shop'))
+        self.create_products(6)
+        with CaptureQueriesContext(connection) as many:
+            self.client.get(reverse('home'))
+            self.client.get(reverse('shop'))
+        self.assertEqual(len(few), len(many))
+
+
+@override_settings(
+    DEFAULT_FILE_STORAGE='django.core.files.storage.FileSystemStorage',
+    MEDIA_ROOT=MEDIA_ROOT,
+    PENDING_IMAGE_ROOT=PENDING_IMAGE_ROOT,
+    IMAGE_PROCESSING_ASYNC=True,
+)
+class ImageQueueTest(TestCase):
+    """
+    Test class for the background image pipeline.
+    Checks uploads are queued untouched, shown as a placeholder, processed
+    by the worker command or in the request when async is off, and that
+    failures and deletes are handled.
+    """
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='seller@example.com', password='password123'
+        )
+        self.client.login(email='seller@example.com', password='password123')
+        Brand.objects.create(name="Shimano")
+        Category.objects.create(name="Reels")
+
+    def list_product(self, *uploads):
+        return self.client.post(reverse('list-product'), {
+            'brand': "Shimano", 'category': "Reels", 'name': "Reel",
+            'condition': "Good", 'price': 10, 'shipping': 2,
+            'images': list(uploads),
+        })
+
+    def pending_path(self, image):
+        return os.path.join(PENDING_IMAGE_ROOT, image.pending_file)
+
+    def process_images(self, **options):
+        call_command(
+            'process_images', workers=0, once=True, stdout=StringIO(),
+            **options
+        )
+
+    def test_upload_is_queued_then_processed(self):
+        response = self.list_product(make_upload(size=(1200, 900)))
+        self.assertEqual(response.status_code, 302)
+        image = ProductImage.objects.get()
+        self.assertEqual(image.status, 'pending')
+        self.assertTrue(os.path.exists(self.pending_path(image)))
+        self.assertContains(
+            self.client.get('/'), static(ProductImage.PLACEHOLDER)
+        )
+
+        self.process_images()
+        image.refresh_from_db()
+        self.assertEqual((image.status, image.pending_file), ('ready', ''))
+        self.assertEqual(Image.open(image.image.path).size, (894, 670))
+        self.assertEqual(image.url, image.image.url)
+
+    def test_unreadable_upload_fails_and_can_be_retried(self):
+        self.list_product(make_upload())
+        image = ProductImage.objects.get()
+        with open(self.pending_path(image), 'wb') as raw:
+            raw.write(b'not an image')
+
+        with self.assertLogs('tackle.image_queue', 'ERROR'):
+            self.process_images()
+        image.refresh_from_db()
+        self.assertEqual(image.status, 'failed')
+        self.assertEqual(image.url, static(ProductImage.PLACEHOLDER))
+
+        with open(self.pending_path(image), 'wb') as raw:
+            raw.write(make_upload().read())
+        self.process_images(retry_failed=True)
+        image.refresh_from_db()
+        self.assertEqual(image.status, 'ready')
+
+    @override_settings(IMAGE_PROCESSING_ASYNC=False)
+    def test_processes_in_request_when_async_is_off(self):
+        uploads = [make_upload(f'{i}.jpg', size=(1200, 900)) for i in range(3)]
+        with CaptureQueriesContext(connection) as queries:
+            self.list_product(*uploads)
+        inserts = [
+            query for query in queries.captured_queries
+            if query['sql'].startswith('INSERT INTO "tackle_productimage"')
+        ]
+        self.assertEqual(len(inserts), 1)
+        images = ProductImage.objects.order_by('id')
+        self.assertEqual(
+            [image.status for image in images], ['ready'] * 3
+        )
+        self.assertEqual(Image.open(images[0].image.path).width, 894)
+        self.assertEqual(Product.objects.get().primary_image, images[0])
+
+    def test_deleting_pending_image_removes_upload(self):
+        self.list_product(make_upload())
+        image = ProductImage.objects.get()
+        with self.captureOnCommitCallbacks(execute=True):
+            image.delete()
+        self.assertFalse(os.path.exists(self.pending_path(image)))
+
+    def test_rejects_files_that_are_not_images(self):
+        fake = SimpleUploadedFile('reel.jpg', b'not an image', 'image/jpeg')
+        response = self.list_product(fake)
+        self.assertContains(response, 'Invalid image')
+        self.assertFalse(Product.objects.exists())
+
+    @override_settings(IMAGE_PROCESSING_ASYNC=False)
+    def test_undecodable_upload_leaves_no_product(self):
+        data = make_upload(size=(1200, 900)).read()
+        truncated = SimpleUploadedFile(
+            'reel.jpg', data[:len(data) // 2], 'image/jpeg'
+        )
+        response = self.list_product(make_upload(), truncated)
+        self.assertContains(response, 'Invalid image')
+        self.assertFalse(Product.objects.exists())
+        self.assertFalse(ProductImage.objects.exists())
+        self.assertFalse(FacetCount.objects.filter(count__gt=0).exists())
+
+    @override_settings(IMAGE_PROCESSING_ASYNC=False)
+    def test_undecodable_upload_leaves_edited_product_unchanged(self):
+        self.list_product(make_upload())
+        product = Product.objects.get()
+        image = product.images.get()
+        data = make_upload(size=(1200, 900)).read()
+        response = self.client.post(
+            reverse('edit_product', args=[product.id]), {
+                'name': "Renamed", 'price': 10, 'shipping': 2,
+                'brand': "Shimano", 'category': "Reels",
+                'visibility': "live", 'delete_images': [image.id],
+                'images': [SimpleUploadedFile(
+                    'reel.jpg', data[:len(data) // 2], 'image/jpeg'
+                )],
+            }
+        )
+        self.assertRedirects(
+            response, reverse('edit_product', args=[product.id]),
+            fetch_redirect_response=False
+        )
+        product.refresh_from_db()
+        self.assertEqual(product.name, "Reel")
+        self.assertEqual(list(product.images.all()), [image])
+        self.assertEqual(product.primary_image, image)
+
+    @override_settings(IMAGE_PROCESSING_ASYNC=False)
+    def test_transparent_pngs_are_flattened(self):
+        uploads = []
+        for mode, colour in (('LA', (0, 0)), ('RGBA', (0, 0, 0, 0))):
+            buffer = BytesIO()
+            Image.new(mode, (40, 30), colour).save(buffer, format='PNG')
+            uploads.append(SimpleUploadedFile(
+                f'{mode}.png', buffer.getvalue(), 'image/png'
+            ))
+        self.list_product(*uploads)
+        greyscale, colour = ProductImage.objects.order_by('id')
+        for image, white in ((greyscale, 255), (colour, (255, 255, 255))):
+            self.assertEqual(image.status, 'ready')
+            self.assertEqual(
+                Image.open(image.image.path).getpixel((0, 0)), white
+            )
+
+
+@override_settings(
+    DEFAULT_FILE_STORAGE='django.core.files.storage.FileSystemStorage',
+    MEDIA_ROOT=MEDIA_ROOT,
+    IMAGE_PROCESSING_ASYNC=False,
+)
+class ResponsiveImageTest(TestCase):
+    """
+    Test class for the responsive WebP/JPEG image variants.
+    Checks which variants are made and stored, and the picture markup.
+    """
+    def setUp(self):
+        user = User.objects.create_user(
+            email='seller@example.com', password='password123'
+        )
+        self.product = Product.objects.create(
+            brand=Brand.objects.create(name="Shimano"),
+            category=Category.objects.create(name="Reels"),
+            name="Reel", condition="Good", user=user, visibility="live"
+        )
+
+    def test_variants_are_made_up_to_the_image_width(self):
+        processed = process_image(make_upload(size=(700, 500)))
+        self.assertEqual(
+            [(extension, width) for extension, width, _ in processed.variants],
+            [('webp', 160), ('jpeg', 160), ('webp', 320), ('jpeg', 320),
+             ('webp', 640), ('jpeg', 640), ('webp', 700)]
+        )
+
+    def test_variants_are_stored_with_the_image(self):
+        image, = process_images_now(
+            self.product, [make_upload(size=(1200, 900))]
+        )
+        self.assertEqual(
+            {extension: sorted(widths, key=int)
+             for extension, widths in image.variants.items()},
+            {'webp': ['160', '320', '640', '894'],
+             'jpeg': ['160', '320', '640', '894']}
+        )
+        self.assertEqual(image.variants['jpeg']['894'], image.image.name)
+        for name in image.variants['webp'].values():
+            self.assertTrue(image.image.storage.exists(name))
+        self.assertTrue(image.srcset('webp').endswith('.webp 894w'))
+
+    def test_picture_markup(self):
+        image, = process_images_now(
+            self.product, [make_upload(size=(1200, 900))]
+        )
+        html = product_picture(image, alt="Reel", css_class="card-image")
+        self.assertIn('<source type="image/webp" srcset="', html)
+        self.assertIn(f'srcset="{image.srcset("jpeg")}"', html)
+        self.assertIn('sizes="(min-width: 768px) 25vw, 50vw"', html)
+
+        pending = ProductImage(product=self.product, status='pending')
+        self.assertEqual(
+            product_picture(pending, alt="Reel"),
+            f'<img src="{pending.url}" alt="Reel" class="" loading="lazy">'
+        )
+        self.assertEqual(product_picture(None), '')
+
+    def test_cards_offer_webp(self):
+        process_images_now(self.product, [make_upload(size=(1200, 900))])
+        self.product.refresh_primary_image()
+        self.assertContains(self.client.get('/'), 'type="image/webp"')
+        self.assertContains(self.client.get('/shop/'), 'type="image/webp"')
+
+
+@override_settings(
+    DEFAULT_FILE_STORAGE='django.core.files.storage.FileSystemStorage',
+    MEDIA_ROOT=MEDIA_ROOT,
+    IMAGE_PROCESSING_ASYNC=False,
+)
+class ImageBlobTest(TestCase):
+    """
+    Test class for the content-addressed image blob storage.
+    Checks identical photos are stored once and only removed from storage
+    when the last image using them is deleted.
+    """
+    def setUp(self):
+        user = User.objects.create_user(
+            email='seller@example.com', password='password123'
+        )
+        self.products = [
+            Product.objects.create(
+                brand=Brand.objects.create(name="Shimano"),
+                category=Category.objects.create(name="Reels"),
+                name="Reel", condition="Good", user=user, visibility="live"
+            )
+            for _ in range(2)
+        ]
+
+    def add_image(self, product, colour='red'):
+        image, = process_images_now(
+            product, [make_upload(size=(700, 500), colour=colour)]
+        )
+        return image
+
+    def exists(self, name):
+        return os.path.exists(os.path.join(MEDIA_ROOT, name))
+
+    def test_identical_photos_share_blobs(self):
+        first = self.add_image(self.products[0])
+        second = self.add_image(self.products[1])
+        self.assertEqual(first.image.name, second.image.name)
+        self.assertEqual(first.variants, second.variants)
+        self.assertTrue(first.image.name.startswith(ImageBlob.PREFIX))
+
+        blobs = ImageBlob.objects.filter(name__in=first.blob_names())
+        self.assertEqual(blobs.count(), len(first.blob_names()))
+        self.assertEqual({blob.refcount for blob in blobs}, {2})
+
+        other = self.add_image(self.products[1], colour='blue')
+        self.assertNotEqual(other.image.name, first.image.name)
+
+    def test_blobs_are_deleted_with_their_last_image(self):
+        first = self.add_image(self.products[0])
+        second = self.add_image(self.products[1])
+        names = first.blob_names()
+
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertTrue(all(self.exists(name) for name in names))
+        self.assertEqual(
+            set(ImageBlob.objects.values_list('refcount', flat=True)), {1}
+        )
+
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertFalse(any(self.exists(name) for name in names))
+        self.assertFalse(ImageBlob.objects.exists())
+
+    def test_blobs_keep_the_name_storage_saved_them_under(self):
+        first = self.add_image(self.products[0])
+        names = first.blob_names()
+        # Leave the files behind without their rows, then race another
+        # upload of the same bytes for each name
+        ProductImage.objects.all().delete()
+        ImageBlob.objects.all().delete()
+        storage = FileSystemStorage(location=MEDIA_ROOT)
+        raced = set()
+
+        def exists(name):
+            if name in raced:
+                return os.path.exists(os.path.join(MEDIA_ROOT, name))
+            raced.add(name)
+            return False
+
+        with mock.patch('tackle.models.default_storage', storage), \
+                mock.patch.object(storage, 'exists', exists):
+            second = self.add_image(self.products[1])
+        second.refresh_from_db()
+        self.assertFalse(second.blob_names() & names)
+        self.assertEqual(
+            set(ImageBlob.objects.values_list('name', flat=True)),
+            second.blob_names()
+        )
+        self.assertTrue(all(self.exists(name) for name in second.blob_names()))
+
+    def test_failed_upload_takes_no_references(self):
+        first = self.add_image(self.products[0])
+        with mock.patch.object(
+            ImageBlob.objects, 'store', side_effect=OSError
+        ), self.assertRaises(OSError):
+            self.add_image(self.products[1], colour='blue')
+        self.assertEqual(
+            set(ImageBlob.objects.values_list('refcount', flat=True)), {1}
+        )
+        self.assertEqual(
+            ImageBlob.objects.count(), len(first.blob_names())
+        )
+        self.assertEqual(ProductImage.objects.count(), 1)
+
+    def test_direct_uploads_use_the_current_month(self):
+        with mock.patch('tackle.models.datetime') as fake_datetime:
+            fake_datetime.now.return_value = datetime(2031, 2, 3)
+            image = ProductImage.objects.create(
+                product=self.products[0], image=make_upload()
+            )
+        self.assertTrue(
+            image.image.name.startswith('product-images/2031/02/')
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            image.delete()
+        self.assertTrue(self.exists(image.image.name))
+
+    def test_blobs_are_cached_as_immutable(self):
+        storage = MediaStorage()
+        self.assertIn(
+            'immutable',
+            storage.get_object_parameters(
+                f"{ImageBlob.PREFIX}ab/cd/abcd.jpg"
+            )['CacheControl']
+        )
+        self.assertEqual(
+            storage.get_object_parameters('product-images/2023/10/a.jpg'),
+            {'CacheControl': 'max-age=86400'}
+        )
+
+
+class MediaStorageUrlTest(TestCase):
+    """
+    Test class for MediaStorage's remembered public URLs.
+    Checks they match S3Boto3Storage and are only built once per name.
+    """
+    def test_urls_are_built_once(self):
+        name = f"{ImageBlob.PREFIX}ab/cd/abcd.jpg"
+        with mock.patch(
+            'storages.backends.s3boto3.S3Boto3Storage.url',
+            autospec=True, return_value='https://example.com/abcd.jpg'
+        ) as build_url:
+            storage = MediaStorage()
+            for _ in range(3):
+                self.assertEqual(
+                    storage.url(name), 'https://example.com/abcd.jpg'
+                )
+            storage.url(name, parameters={'download': 1})
+        self.assertEqual(build_url.call_count, 2)
+
+    def test_matches_s3_storage(self):
+        name = 'product-images/2023/10/reel photo.jpg'
+        self.assertEqual(MediaStorage().url(name), S3Boto3Storage().url(name))
+        self.assertEqual(
+            MediaStorage().url(name),
+            'https://sellyourtackle.s3.amazonaws.com/'
+            'product-images/2023/10/reel%20photo.jpg'
+        )
+
+
+@override_settings(
+    DEFAULT_FILE_STORAGE='django.core.files.storage.FileSystemStorage',
+    MEDIA_ROOT=MEDIA_ROOT,
+    IMAGE_PROCESSING_ASYNC=False,
+)
+class ReprocessImagesTest(TestCase):
+    """
+    Test class for the reprocess_product_images backfill command.
+    Checks images are regenerated as blobs in id order, that --limit and
+    the checkpoint let a run resume, that --dry-run changes nothing,
+    that stored JPEGs are not re-encoded on every run and that files from
+    before blobs are deleted once replaced.
+    """
+    def setUp(self):
+        user = User.objects.create_user(
+            email='seller@example.com', password='password123'
+        )
+        product = Product.objects.create(
+            brand=Brand.objects.create(name="Shimano"),
+            category=Category.objects.create(name="Reels"),
+            name="Reel", condition="Good", user=user, visibility="live"
+        )
+        # Stored before blobs and responsive variants existed
+        self.legacy = [
+            ProductImage.objects.create(
+                product=product,
+                image=make_upload(f'{colour}.jpg', (700, 500), colour)
+            )
+            for colour in ('red', 'blue')
+        ]
+        self.blob_image, = process_images_now(
+            product, [make_upload(size=(700, 500), colour='green')]
+        )
+        self.checkpoint = os.path.join(
+            tempfile.mkdtemp(dir=MEDIA_ROOT), 'checkpoint.json'
+        )
+
+    def reprocess(self, **options):
+        out = StringIO()
+        with self.captureOnCommitCallbacks(execute=True):
+            call_command(
+                'reprocess_product_images', workers=0,
+                checkpoint=self.checkpoint, stdout=out, **options
+            )
+        return out.getvalue()
+
+    def test_dry_run_changes_nothing(self):
+        out = self.reprocess(dry_run=True)
+        self.assertIn("Would reprocess 3 images.", out)
+        for image in self.legacy:
+            image.refresh_from_db()
+            self.assertEqual(image.variants, {})
+        self.assertFalse(os.path.exists(self.checkpoint))
+
+    def test_limit_and_resume(self):
+        legacy_name = self.legacy[0].image.name
+        self.reprocess(limit=1, batch_size=1)
+        self.assertFalse(default_storage.exists(legacy_name))
+        self.assertTrue(default_storage.exists(self.legacy[1].image.name))
+        first, second = self.legacy
+        first.refresh_from_db()
+        second.refresh_from_db()
+        self.assertTrue(first.image.name.startswith(ImageBlob.PREFIX))
+        self.assertIn('webp', first.variants)
+        self.assertEqual(second.variants, {})
+        with open(self.checkpoint) as checkpoint:
+            self.assertEqual(json.load(checkpoint), {'last_id': first.id})
+
+        out = self.reprocess(batch_size=1)
+        self.assertIn(f"Resuming after image {first.id}.", out)
+        self.assertIn("Reprocessed 2 images, 0 failed", out)
+        second.refresh_from_db()
+        self.assertIn('webp', second.variants)
+        self.assertFalse(os.path.exists(self.checkpoint))
+
+    def test_replaced_blobs_are_released(self):
+        old_names = self.blob_image.blob_names()
+        with mock.patch(
+            'tackle.management.commands.reprocess_product_images.'
+            'process_stored_image',
+            lambda data: process_stored_image(data, variant_widths=(320,))
+        ):
+            self.reprocess()
+        self.blob_image.refresh_from_db()
+        self.assertEqual(
+            sorted(self.blob_image.variants['webp']), ['320', '700']
+        )
+        unused = old_names - self.blob_image.blob_names()
+        self.assertTrue(unused)
+        self.assertFalse(ImageBlob.objects.filter(name__in=unused).exists())
+        self.assertEqual(
+            set(ImageBlob.objects.values_list('refcount', flat=True)), {1}
+        )
+
+    def test_rerun_keeps_stored_jpeg(self):
+        name = self.blob_image.image.name
+        with default_storage.open(name) as stored:
+            data = stored.read()
+        self.reprocess()
+        self.reprocess(restart=True)
+        self.blob_image.refresh_from_db()
+        self.assertEqual(self.blob_image.image.name, name)
+        with default_storage.open(name) as stored:
+            self.assertEqual(stored.read(), data)
+
+        # A JPEG over the current size limit is re-encoded once
+        processed = process_stored_image(data, target_filesize=len(data) - 1)
+        self.assertLess(processed.size, len(data))
+
+
+@override_settings(
+    DEFAULT_FILE_STORAGE='django.core.files.storage.FileSystemStorage',
+    MEDIA_ROOT=MEDIA_ROOT,
+    IMAGE_PROCESSING_ASYNC=False,
+)
+class ImageMetadataTest(TestCase):
+    """
+    Test class for the dimensions, size and colour stored on ProductImage.
+    Checks they are recorded when processed, backfilled for older images,
+    and rendered without reading the stored file.
+    """
+    def setUp(self):
+        user = User.objects.create_user(
+            email='seller@example.com', password='password123'
+        )
+        self.product = Product.objects.create(
+            brand=Brand.objects.create(name="Shimano"),
+            category=Category.objects.create(name="Reels"),
+            name="Reel", condition="Good", user=user, visibility="live"
+        )
+
+    def assertRed(self, colour):
+        red, green, blue = (int(colour[i:i + 2], 16) for i in (1, 3, 5))
+        self.assertGreater(red, 240)
+        self.assertLess(max(green, blue), 15)
+
+    def test_recorded_when_processed(self):
+        image, = process_images_now(
+            self.product, [make_upload(size=(1200, 900))]
+        )
+        image.refresh_from_db()
+        self.assertEqual((image.width, image.height), (894, 670))
+        self.assertEqual(image.size, image.image.size)
+        self.assertRed(image.dominant_colour)
+
+    def test_backfill(self):
+        legacy = ProductImage.objects.create(
+            product=self.product, image=make_upload(size=(300, 200))
+        )
+        process_images_now(self.product, [make_upload(colour='blue')])
+        out = StringIO()
+        call_command('backfill_image_metadata', stdout=out)
+        self.assertIn("Updated 1 images, 0 failed.", out.getvalue())
+        legacy.refresh_from_db()
+        self.assertEqual((legacy.width, legacy.height), (300, 200))
+        self.assertEqual(legacy.size, legacy.image.size)
+        self.assertRed(legacy.dominant_colour)
+
+    def test_pages_render_sizes_without_reading_files(self):
+        image, = process_images_now(
+            self.product, [make_upload(size=(700, 500))]
+        )
+        self.product.refresh_primary_image()
+        with mock.patch(
+            'django.core.files.storage.FileSystemStorage.open',
+            side_effect=AssertionError("read the stored file")
+        ):
+            home = self.client.get('/')
+            page = self.client.get(
+                reverse('product', args=[self.product.slug])
+            )
+        for response in (home, page):
+            self.assertContains(
+                response,
+                f'width="700" height="500" '
+                f'style="background-color: {image.dominant_colour}"'
+            )
+
+
+class CartTest(TestCase):
+    """
+    Test class for the session cart.
+    Checks the session holds only ids and pence, that the cart pages load
+    every product with one query, and the totals.
+    """
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='seller@example.com', password='password123'
+        )
+        self.brand = Brand.objects.create(name="Shimano")
+        self.category = Category.objects.create(name="Reels")
+        self.client.force_login(self.user)
+
+    def create_product(self, price='10.50', shipping='2.25'):
+        return Product.objects.create(
+            brand=self.brand, category=self.category, name="Reel",
+            condition="Good", user=self.user, visibility="live",
+            price=price, shipping=shipping
+        )
+
+    def add(self, product):
+        return self.client.post(reverse('add_to_cart', args=[product.id]))
+
+    def test_session_holds_ids_and_pence(self):
+        product = self.create_product()
+        self.add(product)
+        self.assertEqual(
+            self.client.session['cart'], {str(product.id): [1, 1050, 225]}
+        )
+
+    def test_pages_load_products_in_one_query(self):
+        self.add(self.create_product())
+        with CaptureQueriesContext(connection) as one:
+            self.client.get(reverse('cart'))
+        for _ in range(4):
+            self.add(self.create_product())
+        with CaptureQueriesContext(connection) as five:
+            response = self.client.get(reverse('cart'))
+        self.assertEqual(len(one), len(five))
+        self.assertContains(response, 'value="Remove"', count=5)
+
+    def test_totals(self):
+        products = [
+            self.create_product(), self.create_product('3.00', '0.99')
+        ]
+        for product in products:
+            self.add(product)
+        response = self.client.get(reverse('cart'))
+        cart = response.context['cart']
+        self.assertEqual(cart.get_total_price(), Decimal('13.50'))
+        self.assertEqual(cart.get_shipping_total(), Decimal('3.24'))
+        self.assertEqual(cart.get_combined_total(), Decimal('16.74'))
+        self.assertEqual(cart.get_combined_total_pence(), 1674)
+        self.assertContains(response, "£16.74")
+
+        products[1].delete()
+        cart = self.client.get(reverse('cart')).context['cart']
+        self.assertEqual([item.product for item in cart], products[:1])
+
+    def test_reads_carts_stored_before(self):
+        product = self.create_product()
+        session = self.client.session
+        session['cart'] = {str(product.id): {
+            'price': '10.50', 'quantity': 1, 'product_id': product.id,
+            'thumbnail_id': None, 'shipping_cost': '2.25',
+        }}
+        session.save()
+        cart = self.client.get(reverse('cart')).context['cart']
+        self.assertEqual(cart.get_combined_total_pence(), 1275)
+        item, = cart
+        self.assertEqual(item.total_price, Decimal('12.75'))
+
+
+class CartRevalidationTest(TestCase):
+    """
+    Test class for cart revalidation against current products.
+    Checks sold, unpublished, deleted and repriced items are reported and
+    fixed in one query, on the cart page and before payment.
+    """
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='buyer@example.com', password='password123'
+        )
+        self.client.force_login(self.user)
+        self.brand = Brand.objects.create(name="Shimano")
+        self.category = Category.objects.create(name="Reels")
+
+    def create_products(self, count):
+        products = []
+        for i in range(count):
+            product = Product.objects.create(
+                brand=self.brand, category=self.category, name=f"Reel {i}",
+                condition="Good", user=self.user, visibility="live",
+                price='10.00', shipping='2.00'
+            )
+            self.client.post(reverse('add_to_cart', args=[product.id]))
+            products.append(product)
+        return products
+
+    def test_reports_and_fixes_changes(self):
+        repriced, sold, draft, deleted, unchanged = self.create_products(5)
+        Product.objects.filter(id=repriced.id).update(
+            price='8.50', shipping='3.00'
+        )
+        Product.objects.filter(id=sold.id).update(financial_status='sold')
+        Product.objects.filter(id=draft.id).update(visibility='draft')
+        deleted_id = deleted.id
+        deleted.delete()
+
+        response = self.client.get(reverse('cart'))
+        self.assertEqual(response.context['cart_changes'], [
+            CartChange(repriced.id, "Reel 0", CartChange.PRICE_CHANGED,
+                       Decimal('10.00'), Decimal('8.50')),
+            CartChange(repriced.id, "Reel 0", CartChange.SHIPPING_CHANGED,
+                       Decimal('2.00'), Decimal('3.00')),
+            CartChange(sold.id, "Reel 1", CartChange.SOLD),
+            CartChange(draft.id, "Reel 2", CartChange.UNAVAILABLE),
+            CartChange(deleted_id, None, CartChange.UNAVAILABLE),
+        ])
+        self.assertContains(response, "now costs £8.50 (was £10.00)")
+        self.assertContains(response, "has sold and was removed")
+        self.assertEqual(
+            [item.product for item in response.context['cart']],
+            [repriced, unchanged]
+        )
+        self.assertEqual(
+            self.client.session['cart'],
+            {str(repriced.id): [1, 850, 300],
+             str(unchanged.id): [1, 1000, 200]}
+        )
+        again = self.client.get(reverse('cart'))
+        self.assertEqual(again.context['cart_changes'], [])
+
+    def test_query_count_does_not_grow_with_items(self):
+        for product in self.create_products(1):
+            Product.objects.filter(id=product.id).update(price='9.00')
+        with CaptureQueriesContext(connection) as one:
+            self.client.get(reverse('cart'))
+        for product in self.create_products(6):
+            Product.objects.filter(id=product.id).update(price='9.00')
+        with CaptureQueriesContext(connection) as many:
+            response = self.client.get(reverse('cart'))
+        self.assertEqual(len(response.context['cart_changes']), 6)
+        self.assertEqual(len(one), len(many))
+
+    def test_payment_refused_when_cart_changed(self):
+        product, = self.create_products(1)
+        Product.objects.filter(id=product.id).update(financial_status='sold')
+        response = self.client.post(
+            reverse('handle_payment'), {'payment_method': 'pm_card_visa'}
+        )
+        data = response.json()
+        self.assertIn("Your cart has changed", data['error'])
+        self.assertIn("has sold and was removed", data['error_html'])
+        self.assertFalse(Order.objects.exists())
+        self.assertNotIn(str(product.id), self.client.session['cart'])
+
+
+class CartCountTest(TestCase):
+    """
+    Test class for the lazy cart count context processor.
+    Checks visitors without a session cookie never build a cart and the
+    count is only read from the session when a template uses it.
+    """
+    def setUp(self):
+        self.product = Product.objects.create(
+            brand=Brand.objects.create(name="Shimano"),
+            category=Category.objects.create(name="Reels"),
+            name="Reel", condition="Good", visibility="live",
+            user=User.objects.create_user(
+                email='seller@example.com', password='password123'
+            ),
+            price=10, shipping=2
+        )
+
+    def test_no_session_cookie_skips_the_cart(self):
+        with mock.patch('tackle.context_processors.Cart') as cart:
+            response = self.client.get(reverse('about-us'))
+        self.assertEqual(response.context['total_items_in_cart'], 0)
+        cart.assert_not_called()
+
+    def test_count_is_read_only_when_used(self):
+        self.client.post(reverse('add_to_cart', args=[self.product.id]))
+        request = RequestFactory().get('/')
+        request.COOKIES = {
+            key: morsel.value for key, morsel in self.client.cookies.items()
+        }
+        SessionMiddleware(lambda request: None).process_request(request)
+        request.user = AnonymousUser()
+
+        with mock.patch(
+            'tackle.context_processors.Cart', wraps=Cart
+        ) as cart:
+            count = cart_processor(request)['total_items_in_cart']
+            cart.assert_not_called()
+            self.assertEqual((count(), count()), (1, 1))
+        cart.assert_called_once()
+        self.assertContains(
+            self.client.get(reverse('about-us')), 'View Cart, 1 items in cart'
+        )
+
+
+class CartCookieTest(TestCase):
+    """
+    Test class for the signed cookie cart kept for anonymous shoppers.
+    Checks carting writes nothing to the session, the cookie cannot be
+    forged, and the cart moves to the session on login.
+    """
+    def setUp(self):
+        self.user = User.objects.create_user(
+            email='buyer@example.com', password='password123'
+        )
+        self.product = Product.objects.create(
+            brand=Brand.objects.create(name="Shimano"),
+            category=Category.objects.create(name="Reels"),
+            name="Reel", condition="Good", visibility="live",
+            user=User.objects.create_user(
+                email='seller@example.com', password='password123'
+            ),
+            price='10.50', shipping='2.25'
+        )
+
+    def add(self):
+        return self.client.post(
+            reverse('add_to_cart', args=[self.product.id])
+        )
+
+    def test_anonymous_carting_writes_no_session(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.add()
+            cart_page = self.client.get(reverse('cart'))
+        self.assertFalse(response.wsgi_request.session.modified)
+        self.assertNotIn(settings.SESSION_COOKIE_NAME, self.client.cookies)
+        self.assertFalse([
+            query for query in queries.captured_queries
+            if 'django_session' in query['sql']
+        ])
+        cart = cart_page.context['cart']
+        self.assertEqual(cart.get_combined_total(), Decimal('12.75'))
+
+        self.client.post(reverse('remove_from_cart', args=[self.product.id]))
+        self.assertEqual(
+            self.client.cookies[settings.CART_COOKIE_NAME].value, ''
+        )
+
+    def test_forged_cookie_is_ignored(self):
+        self.add()
+        cookie = self.client.cookies[settings.CART_COOKIE_NAME]
+        value, signature = cookie.value.rsplit(':', 1)
+        self.client.cookies[settings.CART_COOKIE_NAME] = (
+            f"{value}:{signature[::-1]}"
+        )
+        cart = self.client.get(reverse('cart')).context['cart']
+        self.assertEqual(len(cart), 0)
+
+    def test_cart_moves_to_session_on_login(self):
+        self.add()
+        response = self.client.post(reverse('login'), {
+            'username': 'buyer@example.com', 'password': 'password123'
+        })
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(
+            self.client.session[settings.CART_SESSION_ID],
+            {str(self.product.id): [1, 1050, 225]}
+        )
+        self.assertEqual(
+            self.client.cookies[settings.CART_COOKIE_NAME].value, ''
+        )
+        cart = self.client.get(reverse('cart')).context['cart']
+        self.assertEqual([item.product for item in cart], [self.product])
+
+
+@override_settings(SESSION_ENGINE='tackle.sessions')
+class SessionEngineTest(TestCase):
+    """
+    Test class for the cache-backed session engine.
+    Checks sessions are served from the cache, unchanged saves write
+    nothing, and saves outside a transaction are coalesced behind it
+    without bringing back deleted sessions.
+    """
+    def setUp(self):
+        cache.clear()
+        self.session = SessionStore()
+        self.session['cart'] = {'1': [1, 1050, 225]}
+        self.session.save()
+
+    def reload(self):
+        return SessionStore(self.session.session_key)
+
+    def test_loads_from_cache_then_database(self):
+        with self.assertNumQueries(0):
+            self.assertEqual(self.reload()['cart'], {'1': [1, 1050, 225]})
+        cache.clear()
+        with self.assertNumQueries(1):
+            self.assertEqual(self.reload()['cart'], {'1': [1, 1050, 225]})
+
+    def test_unchanged_save_writes_nothing(self):
+        session = self.reload()
+        session['cart'] = {'1': [1, 1050, 225]}
+        with self.assertNumQueries(0):
+            session.save()
+
+        session['cart'] = {}
+        session.save()
+        row = Session.objects.get(session_key=session.session_key)
+        self.assertEqual(row.get_decoded(), {'cart': {}})
+
+    def test_saves_outside_transactions_are_written_behind(self):
+        queue = WriteBehindQueue(interval=60)
+        with mock.patch('tackle.sessions.write_behind', queue), \
+                mock.patch('tackle.sessions.threading.Thread'), \
+                mock.patch.object(connection, 'in_atomic_block', False):
+            with self.assertNumQueries(0):
+                for quantity in (2, 3):
+                    session = self.reload()
+                    session['cart'] = {'1': [quantity, 1050, 225]}
+                    session.save()
+            self.assertEqual(self.reload()['cart'], {'1': [3, 1050, 225]})
+        row = Session.objects.get(session_key=session.session_key)
+        self.assertEqual(row.get_decoded()['cart'], {'1': [1, 1050, 225]})
+
+        with self.assertNumQueries(1):
+            self.assertEqual(queue.flush(), 1)
+        row.refresh_from_db()
+        self.assertEqual(row.get_decoded()['cart'], {'1': [3, 1050, 225]})
+
+    def test_deleted_sessions_are_not_written_back(self):
+        queue = WriteBehindQueue(interval=60)
+        with mock.patch('tackle.sessions.write_behind', queue), \
+                mock.patch('tackle.sessions.threading.Thread'), \
+                mock.patch.object(connection, 'in_atomic_block', False):
+            session = self.reload()
+            session['cart'] = {}
+            session.save()
+        # Deleted by another process after the save was queued here
+        Session.objects.filter(session_key=session.session_key).delete()
+
+        self.assertEqual(queue.flush(), 0)
+        self.assertFalse(
+            Session.objects.filter(session_key=session.session_key).exists()
+        )
+
+
+class AutocompleteTest(TestCase):
+    """
+    Test class for the brand and category autocomplete endpoints.
+    Checks substring and typo matches, ranking and the result cap.
+    """
+    def setUp(self):
+        for name in ("Shimano", "Shakespeare", "Daiwa", "Fox", "Nash"):
+            Brand.objects.create(name=name)
+        Category.objects.create(name="Spinning Reels")
+
+    def suggest(self, url_name, term):
+        response = self.client.get(reverse(url_name), {'term': term})
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_substring_match(self):
+        self.assertEqual(self.suggest('search_brands', 'ano'), ["Shimano"])
+
+    def test_typo_tolerance(self):
+        self.assertEqual(self.suggest('search_brands', 'shimno')[0], "Shimano")
+        self.assertEqual(
+            self.suggest('search_categories', 'spining'), ["Spinning Reels"]
+        )
+
+    @override_settings(AUTOCOMPLETE_LIMIT=1)
+    def test_results_are_capped(self):
+        self.assertEqual(len(self.suggest('search_brands', 'sh')), 1)
+
+
+class PrefixIndexTest(TestCase):
+    """
+    Test class for the in-memory autocomplete prefix index.
+    Checks word prefix matches, that warm lookups skip the database and
+    that saving a brand invalidates the index.
+    """
+    def setUp(self):
+        Brand.objects.create(name="Fox International")
+        Brand.objects.create(name="Fox Rage")
+
+    def test_matches_any_word_prefix(self):
+        index = PrefixIndex(["Fox International", "Fox Rage", "Korda"])
+        self.assertEqual(index.search("inter", 10), ["Fox International"])
+        self.assertEqual(
+            index.search("FOX", 10), ["Fox International", "Fox Rage"]
+        )
+        self.assertEqual(index.search("fox", 1), ["Fox International"])
+        self.assertEqual(index.search("  ", 10), [])
+
+    def test_warm_lookup_skips_database(self):
+        autocomplete(Brand, "fox")
+        with self.assertNumQueries(0):
+            self.assertEqual(
+                autocomplete(Brand, "rag"), ["Fox Rage"]
+            )
+
+    def test_saving_a_brand_invalidates(self):
+        self.assertEqual(autocomplete(Brand, "kor"), [])
+        Brand.objects.create(name="Korda")
+        self.assertEqual(autocomplete(Brand, "kor"), ["Korda"])
@@ -14,7 +14,9 @@ from .views import (
     OrderPageView,
     OrderConfirmation,
     SearchView,
-    ShopView
+    SearchStatsView,
+    ShopView,
+    ShopProductsView
 )
 from django.conf import settings
 from django.conf.urls.static import static
@@ -64,6 +66,12 @@ urlpatterns = [
         name='order-confirmation'
     ),
     path('search/', SearchView.as_view(), name='search'),
+    path(
+        'search/stats/', SearchStatsView.as_view(), name='search_stats'
+    ),
     path('shop/', ShopView.as_view(), name='shop'),
+    path(
+        'shop/products/', ShopProductsView.as_view(), name='shop_products'
+    ),
 
 ] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
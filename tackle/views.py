@@ -4,6 +4,7 @@ from decimal import Decimal, InvalidOperation
 # Django core imports
 from django.conf import settings
 from django.contrib import messages
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
 from django.core.exceptions import ObjectDoesNotExist, ValidationError
 from django.db import transaction
@@ -14,25 +15,27 @@ from django.utils.decorators import method_decorator
 from django.views import View
 from django.views.generic import RedirectView, TemplateView
 from django.views.generic.edit import DeleteView
-from django.core.files.uploadedfile import InMemoryUploadedFile
-from django.db.models import Q
-from io import BytesIO
 from django.core.mail import EmailMessage
-from io import BytesIO
-from django.core.files.uploadedfile import InMemoryUploadedFile
 from django.core.files.images import get_image_dimensions
 
 # Third-party imports
 import stripe
-import os
-from PIL import Image
 from slugify import slugify
 from stripe.error import StripeError
 
 # App-specific imports
+from .facets import (
+    build_facets, compute_facets, get_price_band, rollup_rows
+)
 from .forms import CheckoutForm, ContactSellerForm
+from .image_queue import add_product_images
+from .images import IMAGE_ERRORS, is_supported_image
+from .pagination import InvalidCursor, KeysetPaginator
+from .autocomplete import autocomplete
+from .cart import Cart
+from .search import search_cache, search_suggestions
 from .models import (
-    Brand, Category, Product, ProductImage,
+    Brand, Category, Product,
     ProductVisibility, WebhookLog, FinancialStatus
 )
 from auth_app.models import (
@@ -130,28 +133,26 @@ class ListProduct(View):
         )
 
         valid_image_formats = ['image/jpeg', 'image/png']
-        images_to_save = []
-        for uploaded_file in request.FILES.getlist('images'):
-            if uploaded_file.content_type not in valid_image_formats:
+        uploaded_files = request.FILES.getlist('images')
+        for uploaded_file in uploaded_files:
+            if (uploaded_file.content_type not in valid_image_formats or
+                    not is_supported_image(uploaded_file)):
                 context = {
                     'error_message': 'Invalid image. Please use JPEG or PNG.'
                 }
                 return render(request, self.template_name, context)
 
-            processed_image, file_size = process_image(uploaded_file)
-            temp_file = BytesIO()
-            processed_image.save(temp_file, format='JPEG')
-            temp_file.seek(0)
-            images_to_save.append(
-                InMemoryUploadedFile(
-                    temp_file, None, uploaded_file.name,
-                    'image/jpeg', file_size, None
-                )
-            )
-
-        product.save()
-        for image_file in images_to_save:
-            ProductImage.objects.create(product=product, image=image_file)
+        try:
+            # A bad upload leaves no product behind
+            with transaction.atomic():
+                product.save()
+                add_product_images(product, uploaded_files)
+                product.refresh_primary_image()
+        except IMAGE_ERRORS:
+            context = {
+                'error_message': 'Invalid image. Please use JPEG or PNG.'
+            }
+            return render(request, self.template_name, context)
 
         messages.success(request, 'Product added successfully!')
         return redirect('selling')
@@ -160,14 +161,11 @@ class ListProduct(View):
 class SearchBrands(View):
     """
     View for brand search functionality. Returns a list of brand names
-    matching the search term.
+    matching the search term, typos included.
     """
     def get(self, request, *args, **kwargs):
         if 'term' in request.GET:
-            brands = Brand.objects.filter(
-                name__icontains=request.GET.get('term')
-            )
-            brand_list = list(brands.values_list('name', flat=True))
+            brand_list = autocomplete(Brand, request.GET.get('term'))
             return JsonResponse(brand_list, safe=False)
         return JsonResponse([], safe=False)
 
@@ -175,29 +173,32 @@ class SearchBrands(View):
 class SearchCategories(View):
     """
     View for category search functionality. Returns a list of category names
-    matching the search term.
+    matching the search term, typos included.
     """
     def get(self, request, *args, **kwargs):
         if 'term' in request.GET:
-            cats = Category.objects.filter(
-                name__icontains=request.GET.get('term')
-            )
-            cat_list = list(cats.values_list('name', flat=True))
+            cat_list = autocomplete(Category, request.GET.get('term'))
             return JsonResponse(cat_list, safe=False)
         return JsonResponse([], safe=False)
 
 
 class HomeView(TemplateView):
     """
-    Home page view. Displays a list of products that are live and not sold.
+    Home page view. Displays the most recent products that are live and not
+    sold, one keyset page at a time.
     """
     template_name = 'index.html'
+    paginate_by = 12
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['products'] = Product.objects.filter(
-            visibility=ProductVisibility.LIVE
-        ).exclude(financial_status=FinancialStatus.SOLD)
+        products = Product.objects.live().select_related(
+            'user', 'primary_image'
+        )
+        paginator = KeysetPaginator(products, self.paginate_by)
+        page = paginator.get_page(self.request.GET.get('cursor'))
+        context['products'] = page
+        context['page'] = page
         return context
 
 
@@ -239,24 +240,17 @@ class EditProduct(View):
         product.visibility = request.POST.get('visibility')
 
         images_to_delete = request.POST.getlist('delete_images')
-        for image_id in images_to_delete:
-            image = ProductImage.objects.get(id=image_id)
-            image.delete()
-
-        for uploaded_file in request.FILES.getlist('images'):
-            processed_image, _ = process_image(uploaded_file)
-            temp_file = BytesIO()
-            processed_image.save(temp_file, format='JPEG')
-            temp_file.seek(0)
-            file_details = (
-                temp_file, 'image', uploaded_file.name,
-                'image/jpeg', temp_file.tell(), None
-            )
-            uploaded_file = InMemoryUploadedFile(*file_details)
-
-            ProductImage.objects.create(product=product, image=uploaded_file)
+        try:
+            # A bad upload leaves the product and its images as they were
+            with transaction.atomic():
+                product.images.filter(id__in=images_to_delete).delete()
+                add_product_images(product, request.FILES.getlist('images'))
+                product.refresh_primary_image(save=False)
+                product.save()
+        except IMAGE_ERRORS:
+            messages.error(request, 'Invalid image. Please use JPEG or PNG.')
+            return redirect('edit_product', product_id=product.id)
 
-        product.save()
         messages.success(request, 'Product updated successfully!')
         return redirect('selling')
 
@@ -293,155 +287,6 @@ class ProductDeleteView(DeleteView):
         return self.model.objects.filter(user=self.request.user)
 
 
-def process_image(image, target_filesize=2.5*1024*1024, max_width=894):
-    """
-    Process an uploaded image using Pillow to fit the intrinsic size,
-    compress it, and ensure max width.
-    """
-    img = Image.open(image)
-
-    if img.mode in ('RGBA', 'LA') or (
-        img.mode == 'P' and 'transparency' in img.info
-    ):
-        pass
-        background = Image.new(img.mode[:-1], img.size, (255, 255, 255))
-        background.paste(img, img.split()[-1])
-        img = background
-
-    if img.width > max_width:
-        aspect_ratio = img.height / img.width
-        new_height = int(aspect_ratio * max_width)
-        img = img.resize((max_width, new_height), Image.LANCZOS)
-        print(f"Resized to: {img.size}")
-
-    buffer = BytesIO()
-    quality = 100
-    img.save(buffer, format="JPEG", quality=quality)
-
-    while len(buffer.getvalue()) > target_filesize and quality > 30:
-        buffer = BytesIO()
-        quality -= 2
-        img.save(buffer, format="JPEG", quality=quality)
-
-    compressed_image = Image.open(buffer)
-
-    buffer.seek(0, os.SEEK_END)
-    file_size = buffer.tell()
-    buffer.seek(0)
-
-    return compressed_image, file_size
-
-
-class Cart:
-    """
-    Class representing the shopping cart. Manages operations like adding,
-    removing, and iterating over cart items.
-    """
-    def __init__(self, request):
-        """
-        Initialize the cart.
-        """
-        self.session = request.session
-        cart = self.session.get(settings.CART_SESSION_ID)
-        if not cart:
-            cart = self.session[settings.CART_SESSION_ID] = {}
-        self.cart = cart
-
-    def add(self, product, price):
-        """
-        Add a product to the cart or update its quantity.
-        """
-        product_id = str(product.id)
-        if product_id not in self.cart:
-            self.cart[product_id] = {
-                'price': str(price),
-                'quantity': 1,
-                'product_id': product.id,
-                'thumbnail_id': (
-                    product.images.first().id if
-                    product.images.first() else None
-                ),
-                'shipping_cost': str(product.shipping)
-            }
-        else:
-            self.cart[product_id]['quantity'] += 1
-        self.save()
-
-    def save(self):
-        """
-        Mark the session as "modified" to ensure it's saved.
-        """
-        self.session.modified = True
-
-    def remove(self, product):
-        """
-        Remove a product from the cart.
-        """
-        product_id = str(product.id)
-        if product_id in self.cart:
-            del self.cart[product_id]
-            self.save()
-
-    def __iter__(self):
-        """
-        Iterate over the items in the cart and get products from the database.
-        """
-        product_ids = self.cart.keys()
-        products = Product.objects.filter(
-            id__in=product_ids
-        ).prefetch_related('images')
-        for product in products:
-            self.cart[str(product.id)]['product'] = product
-            self.cart[str(product.id)]['product_id'] = product.id
-            self.cart[str(product.id)]['thumbnail'] = product.images.first()
-            self.cart[str(product.id)]['shipping_cost'] = product.shipping
-
-        for item in self.cart.values():
-            item['price'] = Decimal(item['price'])
-            item['shipping_cost'] = Decimal(item.get('shipping_cost', 0))
-            item['total_price'] = (
-                (item['price'] * item['quantity']) + item['shipping_cost']
-            )
-            item['thumbnail'] = (item['thumbnail'])
-            yield item
-
-    def __len__(self):
-        """
-        Count all items in the cart.
-        """
-        return sum(item['quantity'] for item in self.cart.values())
-
-    def get_total_price(self):
-        return sum(
-            Decimal(item['price']) * item['quantity']
-            for item in self.cart.values()
-        )
-
-    def get_shipping_total(self):
-        return sum(
-            Decimal(item['shipping_cost']) * item['quantity']
-            for item in self.cart.values()
-        )
-
-    def get_combined_total(self):
-        """
-        Get the combined total of product prices and shipping costs.
-        """
-        return self.get_total_price() + self.get_shipping_total()
-
-    def clear(self):
-        """
-        Remove the cart from session.
-        """
-        del self.session[settings.CART_SESSION_ID]
-        self.save()
-
-    def contains(self, product):
-        """Check if the cart contains a particular product."""
-        product_id = str(product.id)
-        return product_id in self.cart
-
-
 class AddToCartView(View):
     """
     View for adding a product to the shopping cart.
@@ -469,13 +314,16 @@ class AddToCartView(View):
 
 class CartView(TemplateView):
     """
-    View for the shopping cart page. Displays items currently in the cart.
+    View for the shopping cart page. Displays items currently in the cart,
+    after bringing them up to date with their products.
     """
     template_name = 'cart.html'
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-        context['cart'] = Cart(self.request)
+        cart = Cart(self.request)
+        context['cart_changes'] = cart.revalidate()
+        context['cart'] = cart
         return context
 
 
@@ -507,7 +355,9 @@ class CheckoutView(TemplateView):
         except StripeError as e:
             context['error'] = str(e)
 
-        context['cart'] = Cart(self.request)
+        cart = Cart(self.request)
+        context['cart_changes'] = cart.revalidate()
+        context['cart'] = cart
 
         data = {}
 
@@ -792,36 +642,42 @@ class SearchView(View):
     """
     def get(self, request, *args, **kwargs):
         query = request.GET.get('search_text', '')
-        products = Product.objects.filter(
-            Q(name__icontains=query) |
-            Q(description__icontains=query),
-            financial_status=FinancialStatus.UNSOLD.value,
-            visibility=ProductVisibility.LIVE.value
-        ).values('name', 'slug')[:5]
+        products = search_suggestions(query)
 
-        return JsonResponse(list(products), safe=False)
+        return JsonResponse(products, safe=False)
 
 
-class ShopView(TemplateView):
+@method_decorator(staff_member_required, name='dispatch')
+class SearchStatsView(View):
     """
-    View for the shop page.
-    Displays products based on filters like price, brand, and category.
+    Staff only view reporting this worker's search cache counters.
     """
-    template_name = 'shop.html'
+    def get(self, request, *args, **kwargs):
+        return JsonResponse(search_cache.stats())
 
-    def get_context_data(self, **kwargs):
-        context = super().get_context_data(**kwargs)
 
-        products = Product.objects.filter(
-            visibility=ProductVisibility.LIVE
-        ).exclude(financial_status="sold")
+class ShopFilterMixin:
+    """
+    Builds the filtered product queryset shared by the shop page and its
+    JSON feed from the price, brand, category, condition and price band
+    query parameters.
+    """
+    def get_filtered_products(self):
+        products = Product.objects.live()
 
         max_price = self.request.GET.get('price')
         selected_brand_id = self.request.GET.get('brand')
         selected_category_id = self.request.GET.get('category')
+        selected_condition = self.request.GET.get('condition')
+        selected_price_band = get_price_band(
+            self.request.GET.get('price_band')
+        )
 
         if max_price:
-            products = products.filter(price__lte=max_price)
+            try:
+                products = products.filter(price__lte=Decimal(max_price))
+            except InvalidOperation:
+                pass
 
         if selected_brand_id:
             products = products.filter(brand__id=selected_brand_id)
@@ -829,13 +685,110 @@ class ShopView(TemplateView):
         if selected_category_id:
             products = products.filter(category__id=selected_category_id)
 
-        context['products'] = products
+        if selected_condition:
+            products = products.filter(condition=selected_condition)
+
+        if selected_price_band:
+            lower, upper = selected_price_band
+            if lower is not None:
+                products = products.filter(price__gte=lower)
+            if upper is not None:
+                products = products.filter(price__lt=upper)
+
+        return products
+
+    def get_rollup_filters(self):
+        """
+        The current filters as lookups on the FacetCount rollup, or None
+        when a filter (max price) can only be answered from products.
+        """
+        if self.request.GET.get('price'):
+            return None
+
+        filters = {}
+        if self.request.GET.get('brand'):
+            filters['brand_id'] = self.request.GET['brand']
+        if self.request.GET.get('category'):
+            filters['category_id'] = self.request.GET['category']
+        if self.request.GET.get('condition'):
+            filters['condition'] = self.request.GET['condition']
+        if get_price_band(self.request.GET.get('price_band')):
+            filters['price_band'] = self.request.GET['price_band']
+        return filters
+
+    def get_facets(self, products):
+        """
+        Facet buckets for the current filters, read from the rollup table
+        when possible and aggregated from products otherwise.
+        """
+        rollup_filters = self.get_rollup_filters()
+        if rollup_filters is None:
+            return compute_facets(products)
+        return build_facets(rollup_rows(**rollup_filters))
 
-        context['available_brands'] = Brand.objects.filter(
-            product__in=products
-        ).distinct()
-        context['available_categories'] = Category.objects.filter(
-            product__in=products
-        ).distinct()
+
+class ShopView(ShopFilterMixin, TemplateView):
+    """
+    View for the shop page.
+    Displays products based on filters like price, brand, and category.
+    """
+    template_name = 'shop.html'
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+
+        products = self.get_filtered_products()
+
+        context['products'] = products.select_related(
+            'user', 'primary_image'
+        ).order_by(*KeysetPaginator.ordering)
+
+        facets = self.get_facets(products)
+        context['available_brands'] = facets['brand']
+        context['available_categories'] = facets['category']
+        context['available_conditions'] = facets['condition']
+        context['available_price_bands'] = facets['price_band']
 
         return context
+
+
+class ShopProductsView(ShopFilterMixin, View):
+    """
+    JSON feed of shop product cards for infinite scroll. Takes the same
+    filters as the shop page plus a keyset cursor from the previous page.
+    """
+    paginate_by = 24
+
+    def get(self, request, *args, **kwargs):
+        products = self.get_filtered_products().select_related(
+            'user', 'primary_image'
+        )
+        paginator = KeysetPaginator(products, self.paginate_by)
+
+        try:
+            page = paginator.page(request.GET.get('cursor'))
+        except InvalidCursor:
+            return JsonResponse({'error': 'Invalid cursor'}, status=400)
+
+        return JsonResponse({
+            'results': [product_card(product) for product in page],
+            'next_cursor': page.next_cursor,
+        })
+
+
+def product_card(product):
+    """
+    Serialise the fields a product card needs for the shop feed.
+    """
+    return {
+        'name': product.name,
+        'slug': product.slug,
+        'url': reverse('product', args=[product.slug]),
+        'price': str(product.price),
+        'shipping': str(product.shipping),
+        'condition': product.condition,
+        'seller': product.user.username,
+        'thumbnail_url': (
+            product.primary_image.url if product.primary_image else None
+        ),
+    }